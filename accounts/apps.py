@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "accounts"
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from accounts import signals
+        from accounts.models import User
+
+        post_delete.connect(signals.token_deleted, sender=Token)
+        post_save.connect(signals.user_changed, sender=User)
+        post_delete.connect(signals.user_changed, sender=User)
@@ -0,0 +1,15 @@
+from utils.authentication import token_cache
+
+# changing any of these must take effect on the next request
+AUTHORIZATION_FIELDS = {"is_active", "is_staff", "is_superuser"}
+
+
+def token_deleted(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not AUTHORIZATION_FIELDS & set(update_fields):
+        return
+
+    token_cache.delete_user(instance.pk)
@@ -10,7 +10,9 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from utils.coalescing import SingleFlightMiddleware
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "kmdb.settings")
 
-application = get_asgi_application()
+# concurrent identical anonymous movie reads share one response
+application = SingleFlightMiddleware(get_asgi_application())
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "utils.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,13 +80,114 @@ WSGI_APPLICATION = "kmdb.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# SQLite profile, picked with KMDB_SQLITE_PROFILE. "stock" is Django's default
+# setup; "production" turns on WAL, mmap, a larger page cache, IMMEDIATE write
+# transactions and persistent connections (utils.sqlite_backend). The bulk
+# review transaction reads before it writes, so only IMMEDIATE keeps two
+# concurrent submissions from failing with "database is locked".
+SQLITE_PROFILE = os.environ.get("KMDB_SQLITE_PROFILE", "stock")
+
+SQLITE_PROFILES = {
+    "stock": {"ENGINE": "django.db.backends.sqlite3"},
+    "production": {
+        "ENGINE": "utils.sqlite_backend",
+        "CONN_MAX_AGE": int(os.environ.get("KMDB_CONN_MAX_AGE", 600)),
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                # milliseconds a writer waits for the lock
+                "busy_timeout": int(os.environ.get("KMDB_SQLITE_BUSY_TIMEOUT", 5000)),
+                # bytes
+                "mmap_size": int(os.environ.get("KMDB_SQLITE_MMAP_SIZE", 256 * 2**20)),
+                # negative means KiB
+                "cache_size": int(os.environ.get("KMDB_SQLITE_CACHE_SIZE", -64000)),
+            },
+        },
+    },
+}
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        **SQLITE_PROFILES[SQLITE_PROFILE],
         "NAME": BASE_DIR / "db.sqlite3",
+        # a file rather than the in-memory default, whose shared cache fails
+        # concurrent writers with "table is locked" instead of waiting
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    },
+    # stand-in read replica, refreshed from the primary by
+    # `./manage.py sync_replica`
+    "replica": {
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["utils.routers.ReplicaRouter"]
+
+# Aliases MovieView/ReviewView read from, e.g. KMDB_READ_REPLICAS=replica.
+# Empty means everything uses the primary.
+REPLICA_DATABASES = [
+    alias for alias in os.environ.get("KMDB_READ_REPLICAS", "").split(",") if alias
+]
+
+# Seconds a user keeps reading from the primary after writing, so they see
+# their own changes; replicas must lag less than this.
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Use a shared backend (memcached/redis) when running more than one process,
+# otherwise cache invalidations are not seen by the other workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
     }
 }
 
+# Seconds an anonymous movie response stays cached; entries are invalidated
+# exactly by version bumps, so this only bounds memory usage.
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# In-process token -> user cache used by CachedTokenAuthentication. The
+# timeout is how long other processes, or this one after a queryset
+# update() of users or tokens (no signals), may keep accepting a revoked
+# token; deactivate users through save() to revoke them at once.
+TOKEN_CACHE_TIMEOUT = 60
+TOKEN_CACHE_MAX_ENTRIES = 10000
+
+# Serve movie list/retrieve from values() rows mapped straight to dicts
+# (movies.fastpath) instead of instantiating the DRF serializers. Opt-in:
+# set KMDB_MOVIES_FAST_READ_PATH=1 to turn it on.
+MOVIES_FAST_READ_PATH = os.environ.get("KMDB_MOVIES_FAST_READ_PATH") == "1"
+
+# Movie responses nest at most this many reviews, newest ("recent") or best
+# rated ("stars") first; the rest is paged by /api/movies/<id>/reviews/.
+MOVIE_REVIEWS_LIMIT = 10
+MOVIE_REVIEWS_ORDERING = "recent"
+
+# Concurrent identical anonymous GETs under these paths share one response
+# when served through kmdb.asgi; a waiter gives up after the timeout
+# (seconds) and runs the request itself.
+SINGLE_FLIGHT_PATHS = ["/api/movies/"]
+SINGLE_FLIGHT_TIMEOUT = 5
+
+# Django REST framework
+# utils.renderers.FastJSONRenderer uses orjson when installed; swap it for
+# rest_framework.renderers.JSONRenderer to go back to DRF's renderer.
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "utils.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
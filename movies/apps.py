@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_migrate,
+)
 
 
 class MoviesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "movies"
+
+    def ready(self):
+        from accounts.models import User
+        from movies import signals
+        from movies.models import Genres, Movies, Review
+
+        pre_migrate.connect(signals.suspend_search_index, sender=self)
+        post_migrate.connect(signals.restore_search_index, sender=self)
+
+        post_save.connect(signals.movie_changed, sender=Movies)
+        post_delete.connect(signals.movie_changed, sender=Movies)
+        post_save.connect(signals.genre_changed, sender=Genres)
+        pre_delete.connect(signals.genre_changed, sender=Genres)
+        m2m_changed.connect(signals.genre_links_changed, sender=Genres.movies.through)
+        post_save.connect(signals.review_saved, sender=Review)
+        post_save.connect(signals.critic_changed, sender=User)
@@ -0,0 +1,380 @@
+import json
+import math
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from utils.renderers import FastJSONRenderer, orjson
+
+from accounts.models import User
+from movies.models import Movies
+from movies.seeding import SEED_PASSWORD, seed_catalog
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def get_renderers():
+    stdlib = FastJSONRenderer()
+    stdlib.use_orjson = False
+    renderers = {"drf": JSONRenderer(), "stdlib": stdlib}
+
+    if orjson is not None:
+        renderers["orjson"] = FastJSONRenderer()
+
+    return renderers
+
+
+def timings(durations, queries):
+    return {
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+        "queries": round(sum(queries) / len(queries), 2),
+    }
+
+
+def movie_payload(index):
+    return {
+        "title": f"Benchmark movie {index}",
+        "duration": "120m",
+        "genres": [{"name": "Seed genre 0"}, {"name": f"Benchmark genre {index}"}],
+        "premiere": "2021-01-01",
+        "classification": 14,
+        "synopsis": "Benchmark synopsis",
+    }
+
+
+def review_payload(index):
+    return {"stars": index % 10 + 1, "review": "Benchmark review", "spoilers": False}
+
+
+def bulk_review_payload(movie_ids):
+    return [
+        {"movie_id": movie_id, **review_payload(index)}
+        for index, movie_id in enumerate(movie_ids)
+    ]
+
+
+def import_payload(index, rows=100):
+    return "".join(
+        json.dumps(movie_payload(f"import-{index}-{row}")) + "\n" for row in range(rows)
+    )
+
+
+class BenchmarkRunner:
+    """
+    Seed a deterministic catalog and time every API route through the test
+    client. Everything runs in a transaction that is rolled back at the end,
+    so the database is left untouched.
+    """
+
+    def __init__(self, iterations=20, **seed_options):
+        self.iterations = iterations
+        self.seed_options = seed_options
+
+    def get_cases(self):
+        # (name, method, role, path, body, content type); path and body take
+        # the iteration index. Destructive cases come last.
+        movie_id = self.movie_id
+        created = self.created_movie_ids
+
+        return [
+            (
+                "accounts-create",
+                "post",
+                None,
+                lambda i: "/api/accounts/",
+                lambda i: {
+                    "username": f"benchmark-user-{i}",
+                    "password": SEED_PASSWORD,
+                },
+                "json",
+            ),
+            (
+                "login",
+                "post",
+                None,
+                lambda i: "/api/login/",
+                lambda i: {"username": self.critic.username, "password": SEED_PASSWORD},
+                "json",
+            ),
+            (
+                "movies-list-anonymous",
+                "get",
+                None,
+                lambda i: "/api/movies/",
+                None,
+                None,
+            ),
+            ("movies-list-user", "get", "user", lambda i: "/api/movies/", None, None),
+            (
+                "movies-search",
+                "get",
+                None,
+                lambda i: f"/api/movies/?title=movie {i}",
+                None,
+                None,
+            ),
+            (
+                "movies-retrieve-anonymous",
+                "get",
+                None,
+                lambda i: f"/api/movies/{movie_id(i)}/",
+                None,
+                None,
+            ),
+            (
+                "movies-retrieve-user",
+                "get",
+                "user",
+                lambda i: f"/api/movies/{movie_id(i)}/",
+                None,
+                None,
+            ),
+            (
+                "movies-create",
+                "post",
+                "admin",
+                lambda i: "/api/movies/",
+                movie_payload,
+                "json",
+            ),
+            (
+                "movies-update",
+                "put",
+                "admin",
+                lambda i: f"/api/movies/{movie_id(i)}/",
+                movie_payload,
+                "json",
+            ),
+            (
+                "movies-partial-update",
+                "patch",
+                "admin",
+                lambda i: f"/api/movies/{movie_id(i)}/",
+                lambda i: {"classification": 16},
+                "json",
+            ),
+            (
+                "movies-review-create",
+                "post",
+                "critic",
+                lambda i: f"/api/movies/{movie_id(i)}/review/",
+                review_payload,
+                "json",
+            ),
+            (
+                "movies-review-update",
+                "put",
+                "critic",
+                lambda i: f"/api/movies/{movie_id(i)}/review/",
+                review_payload,
+                "json",
+            ),
+            (
+                "movies-reviews",
+                "get",
+                "user",
+                lambda i: f"/api/movies/{movie_id(i)}/reviews/",
+                None,
+                None,
+            ),
+            (
+                "movies-stats",
+                "get",
+                None,
+                lambda i: f"/api/movies/{movie_id(i)}/stats/",
+                None,
+                None,
+            ),
+            ("reviews-list", "get", "admin", lambda i: "/api/reviews/", None, None),
+            (
+                "reviews-bulk",
+                "post",
+                "critic",
+                lambda i: "/api/reviews/bulk/",
+                # movies the single review cases above did not touch
+                lambda i: bulk_review_payload(
+                    movie_id(self.iterations + i * 10 + k) for k in range(10)
+                ),
+                "json",
+            ),
+            (
+                "movies-import",
+                "post",
+                "admin",
+                lambda i: "/api/movies/import/",
+                import_payload,
+                "application/x-ndjson",
+            ),
+            (
+                "movies-export",
+                "get",
+                "admin",
+                lambda i: "/api/movies/export/",
+                None,
+                None,
+            ),
+            (
+                "movies-destroy",
+                "delete",
+                "admin",
+                lambda i: f"/api/movies/{created[i]}/",
+                None,
+                None,
+            ),
+        ]
+
+    def movie_id(self, index):
+        return self.movie_ids[index % len(self.movie_ids)]
+
+    def setup(self):
+        seed_catalog(**self.seed_options)
+
+        self.movie_ids = list(
+            Movies.objects.order_by("id").values_list("id", flat=True)
+        )
+        self.created_movie_ids = []
+
+        users = {
+            "admin": {"is_staff": True, "is_superuser": True},
+            "critic": {"is_staff": True},
+            "user": {},
+        }
+        self.tokens = {}
+
+        for role, flags in users.items():
+            user = User.objects.create_user(
+                username=f"benchmark-{role}", password=SEED_PASSWORD, **flags
+            )
+            self.tokens[role] = Token.objects.create(user=user).key
+
+            if role == "critic":
+                self.critic = user
+
+    def request(self, client, method, role, path, body, content_type):
+        headers = {}
+
+        if role:
+            headers["HTTP_AUTHORIZATION"] = f"Token {self.tokens[role]}"
+
+        if body is None:
+            return getattr(client, method)(path, **headers)
+
+        if content_type == "json":
+            return getattr(client, method)(path, body, format="json", **headers)
+
+        return client.generic(
+            method.upper(), path, body.encode(), content_type=content_type, **headers
+        )
+
+    def run_case(self, client, case):
+        name, method, role, path, body, content_type = case
+        durations = []
+        queries = []
+
+        for index in range(self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.request(
+                    client,
+                    method,
+                    role,
+                    path(index),
+                    body(index) if body else None,
+                    content_type,
+                )
+
+                if response.streaming:
+                    b"".join(response.streaming_content)
+
+                durations.append(time.perf_counter() - start)
+
+            queries.append(len(captured))
+
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f"{name} returned {response.status_code}: {response.content[:200]}"
+                )
+
+            if name == "movies-create":
+                self.created_movie_ids.append(response.json()["id"])
+
+        return timings(durations, queries)
+
+    def run_render_case(self, renderer, data):
+        durations = []
+
+        for index in range(self.iterations):
+            start = time.perf_counter()
+            renderer.render(data, "application/json")
+            durations.append(time.perf_counter() - start)
+
+        return timings(durations, [0])
+
+    def run(self):
+        results = {}
+
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+                self.setup()
+                client = APIClient()
+
+                # the biggest document we serve: a full page of nested movies
+                movies = self.request(
+                    client, "get", "user", "/api/movies/?page_size=1000", None, None
+                ).data
+
+                for case in self.get_cases():
+                    results[case[0]] = self.run_case(client, case)
+
+                for name, renderer in get_renderers().items():
+                    results[f"render-movies-{name}"] = self.run_render_case(
+                        renderer, movies
+                    )
+
+                raise Rollback
+        except Rollback:
+            pass
+
+        return {
+            "settings": {"iterations": self.iterations, **self.seed_options},
+            "results": results,
+        }
+
+
+def compare(previous, current, threshold):
+    """
+    Return the regressions of `current` against `previous`: a p95 slower by
+    more than `threshold` (a fraction) or more queries per request.
+    """
+    regressions = []
+
+    for name, result in current["results"].items():
+        baseline = previous["results"].get(name)
+
+        if baseline is None:
+            continue
+
+        if result["p95_ms"] > baseline["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {baseline['p95_ms']}ms -> {result['p95_ms']}ms"
+            )
+
+        if result["queries"] > baseline["queries"]:
+            regressions.append(
+                f"{name}: queries {baseline['queries']} -> {result['queries']}"
+            )
+
+    return regressions
@@ -0,0 +1,100 @@
+from django.db import IntegrityError, transaction
+
+from movies.histograms import update_histograms
+from movies.models import Movies, Review
+from movies.ratings import add_movie_ratings
+from movies.serializers import BulkReviewSerializer
+
+
+def submit_reviews(critic, items):
+    """
+    Create the reviews of `critic` described by `items` and return one
+    result per item, in order: "created" (with the review id), "invalid",
+    "not_found" or "duplicate". Costs one query to check the movies, one for
+    the critic's existing reviews, the INSERT, one to read the new ids, one
+    UPDATE of the ratings and one of the histograms, whatever the number of
+    items; the checks and the writes run again if the INSERT conflicts.
+    """
+    results = []
+    valid = []
+
+    for item in items:
+        serializer = BulkReviewSerializer(data=item)
+
+        if serializer.is_valid():
+            results.append({"movie_id": serializer.validated_data["movie_id"]})
+            valid.append((results[-1], serializer.validated_data))
+        else:
+            results.append({"status": "invalid", "errors": serializer.errors})
+
+    try:
+        ids = save_reviews(critic, valid)
+    except IntegrityError:
+        # a concurrent request added one of the reviews, or deleted one of
+        # the movies, after the checks; they see it the second time
+        ids = save_reviews(critic, valid)
+
+    for result in results:
+        if result.get("status") == "created":
+            result["id"] = ids[result["movie_id"]]
+
+    return results
+
+
+def reviewed_movies(critic, movie_ids):
+    return set(
+        Review.objects.filter(critic_id=critic.id, movie_id__in=movie_ids).values_list(
+            "movie_id", flat=True
+        )
+    )
+
+
+def save_reviews(critic, valid):
+    """
+    Set the status of the `valid` (result, validated data) pairs, create
+    their reviews and return the new ids by movie.
+    """
+    with transaction.atomic():
+        # inside the transaction, so with the IMMEDIATE profile no other
+        # request changes them in between; with the stock one a concurrent
+        # writer can still make the INSERT conflict or fail with "database
+        # is locked" (see SQLITE_PROFILE)
+        movies = Movies.objects.only("id").in_bulk(
+            {data["movie_id"] for _, data in valid}
+        )
+        reviewed = reviewed_movies(critic, movies)
+        reviews = {}
+
+        for result, data in valid:
+            movie_id = data["movie_id"]
+
+            if movie_id not in movies:
+                result["status"] = "not_found"
+            elif movie_id in reviewed or movie_id in reviews:
+                result["status"] = "duplicate"
+            else:
+                result["status"] = "created"
+                reviews[movie_id] = Review(critic=critic, **data)
+
+        if not reviews:
+            return {}
+
+        Review.objects.bulk_create(reviews.values())
+
+        # (critic, movie) is unique, so these are exactly the new rows
+        ids = dict(
+            Review.objects.filter(
+                critic_id=critic.id, movie_id__in=reviews
+            ).values_list("movie_id", "id")
+        )
+        add_movie_ratings(
+            {movie_id: review.stars for movie_id, review in reviews.items()}
+        )
+        update_histograms(
+            added=[
+                (movie_id, review.stars, review.spoilers)
+                for movie_id, review in reviews.items()
+            ]
+        )
+
+    return ids
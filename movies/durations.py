@@ -0,0 +1,31 @@
+import re
+
+# the range of the PositiveIntegerField column
+MAX_MINUTES = 2147483647
+
+MINUTES_PATTERN = re.compile(r"^\s*([0-9]+)\s*$")
+
+HOURS_MINUTES_PATTERN = re.compile(
+    r"^\s*(?:([0-9]+)\s*h[a-z]*)?\s*(?:([0-9]+)\s*m[a-z]*)?\s*$", re.IGNORECASE
+)
+
+
+def parse_minutes(value):
+    """
+    The minutes of a duration like "175", "175m", "175 min", "2h55m" or
+    "2 horas 55 minutos", or None when `value` is not one. Used by the API
+    and by the migration that converted the old text column.
+    """
+    match = MINUTES_PATTERN.match(value)
+
+    if match:
+        return int(match.group(1))
+
+    match = HOURS_MINUTES_PATTERN.match(value)
+
+    if not match or not any(match.groups()):
+        return None
+
+    hours, minutes = (int(group or 0) for group in match.groups())
+
+    return hours * 60 + minutes
@@ -0,0 +1,59 @@
+import json
+import tempfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from movies.models import Movies, Review
+from movies.serializers import MovieWithReviewSerializer
+
+
+def iter_movie_chunks(chunk_size):
+    # QuerySet.iterator() drops prefetch_related, so walk the table in id
+    # ranges instead; each chunk costs three queries whatever its position.
+    queryset = Movies.objects.order_by("id").prefetch_related(
+        "genres",
+        Prefetch("reviews", queryset=Review.objects.select_related("critic")),
+    )
+    last_id = 0
+
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+
+        if not chunk:
+            return
+
+        yield chunk
+
+        last_id = chunk[-1].id
+
+
+def export_catalog(chunk_size=500):
+    """
+    Yield the whole catalog as NDJSON, one movie with its genres and reviews
+    per line, holding at most `chunk_size` movies in memory.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    for chunk in iter_movie_chunks(chunk_size):
+        lines = [
+            encoder.encode(movie) + "\n"
+            for movie in MovieWithReviewSerializer(chunk, many=True).data
+        ]
+
+        yield "".join(lines).encode()
+
+
+def spool_catalog(chunk_size=500):
+    """
+    export_catalog() written to a rewound temporary file, so no query runs
+    while the response is being sent (which ASGI does on the event loop).
+    """
+    spool = tempfile.TemporaryFile()
+
+    for chunk in export_catalog(chunk_size):
+        spool.write(chunk)
+
+    spool.seek(0)
+
+    return spool
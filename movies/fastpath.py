@@ -0,0 +1,159 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+
+from movies.models import Genres
+from movies.nested_reviews import get_review_ordering, top_reviews
+from movies.serializers import MovieWithReviewSerializer
+
+MOVIE_COLUMNS = [
+    "id",
+    "title",
+    "duration",
+    "premiere",
+    "classification",
+    "synopsis",
+    "review_count",
+    "average_stars",
+]
+
+REVIEW_COLUMNS = [
+    "id",
+    "movie_id",
+    "critic_id",
+    "critic__first_name",
+    "critic__last_name",
+    "stars",
+    "review",
+    "spoilers",
+]
+
+# mirrors the to_representation of the serializer fields, None is kept as is
+CONVERTERS = {
+    "duration": lambda value: f"{value}m",
+    "premiere": lambda value: value.isoformat(),
+    "average_stars": float,
+}
+
+
+@lru_cache(maxsize=None)
+def compile_mapper(serializer_class, fields=None):
+    """
+    Build a function that turns a values() row into the dict
+    `serializer_class` renders, with the same keys in the same order, or
+    only `fields` (a tuple) of them. Nested lists are expected in the row
+    already.
+    """
+    steps = tuple(
+        (name, CONVERTERS.get(name))
+        for name, field in serializer_class().fields.items()
+        if not field.write_only and (fields is None or name in fields)
+    )
+
+    def mapper(row):
+        data = {}
+
+        for name, converter in steps:
+            value = row[name]
+            data[name] = (
+                value if converter is None or value is None else converter(value)
+            )
+
+        return data
+
+    return mapper
+
+
+def movie_rows(queryset, columns=MOVIE_COLUMNS):
+    # annotations (the search rank) stay in the rows for keyset pagination
+    return queryset.prefetch_related(None).values(*columns, *queryset.query.annotations)
+
+
+def genres_by_movie(movie_ids):
+    # same join the "genres" prefetch runs, so genres come in the same order
+    genres = defaultdict(list)
+    rows = Genres.objects.filter(movies__in=movie_ids).values_list(
+        "movies", "id", "name"
+    )
+
+    for movie_id, genre_id, name in rows:
+        genres[movie_id].append({"id": genre_id, "name": name})
+
+    return genres
+
+
+def reviews_by_movie(movie_ids, ordering, limit):
+    reviews = defaultdict(list)
+    rows = top_reviews(movie_ids, ordering, limit).values_list(*REVIEW_COLUMNS)
+
+    for (
+        review_id,
+        movie_id,
+        critic_id,
+        first_name,
+        last_name,
+        stars,
+        review,
+        spoilers,
+    ) in rows:
+        critic = None
+
+        if critic_id is not None:
+            critic = {"id": critic_id, "first_name": first_name, "last_name": last_name}
+
+        reviews[movie_id].append(
+            {
+                "id": review_id,
+                "critic": critic,
+                "stars": stars,
+                "review": review,
+                "spoilers": spoilers,
+            }
+        )
+
+    return reviews
+
+
+def serialize_movies(rows, serializer_class, reviews_ordering=None, fields=None):
+    """
+    Read-only equivalent of `serializer_class(rows, many=True).data` for
+    movie_rows() rows, restricted to `fields` when given: one query for the
+    genres, one more for the reviews (the first MOVIE_REVIEWS_LIMIT of each
+    movie) when the serializer nests them. Relations left out of `fields`
+    are not queried.
+    """
+    fields = None if fields is None else tuple(fields)
+    mapper = compile_mapper(serializer_class, fields)
+    movie_ids = [row["id"] for row in rows]
+
+    if not movie_ids:
+        return []
+
+    genres = None
+    reviews = None
+
+    if fields is None or "genres" in fields:
+        genres = genres_by_movie(movie_ids)
+
+    if serializer_class is MovieWithReviewSerializer and (
+        fields is None or "reviews" in fields
+    ):
+        reviews = reviews_by_movie(
+            movie_ids,
+            get_review_ordering(reviews_ordering),
+            settings.MOVIE_REVIEWS_LIMIT,
+        )
+
+    data = []
+
+    for row in rows:
+        if genres is not None:
+            row["genres"] = genres.get(row["id"], [])
+
+        if reviews is not None:
+            row["reviews"] = reviews.get(row["id"], [])
+
+        data.append(mapper(row))
+
+    return data
@@ -0,0 +1,45 @@
+import django_filters
+
+from movies.models import Genres, Movies
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    pass
+
+
+class MovieFilter(django_filters.FilterSet):
+    premiere_after = django_filters.DateFilter(field_name="premiere", lookup_expr="gte")
+    premiere_before = django_filters.DateFilter(
+        field_name="premiere", lookup_expr="lte"
+    )
+    max_duration = django_filters.NumberFilter(field_name="duration", lookup_expr="lte")
+
+    # comma separated, matches movies with any of the genres
+    genre = CharInFilter(method="filter_genre")
+    min_classification = django_filters.NumberFilter(
+        field_name="classification", lookup_expr="gte"
+    )
+    max_classification = django_filters.NumberFilter(
+        field_name="classification", lookup_expr="lte"
+    )
+    min_stars = django_filters.NumberFilter(
+        field_name="average_stars", lookup_expr="gte"
+    )
+
+    class Meta:
+        model = Movies
+        fields = ["classification"]
+
+    def filter_genre(self, queryset, name, value):
+        names = [genre.strip() for genre in value if genre.strip()]
+
+        if not names:
+            return queryset
+
+        # a subquery instead of a join, so a movie in two of the genres is
+        # not listed twice; names compare with the column's NOCASE collation
+        movie_ids = Genres.movies.through.objects.filter(genres__name__in=names).values(
+            "movies_id"
+        )
+
+        return queryset.filter(id__in=movie_ids)
@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+
+from movies.models import StarHistogram
+from movies.versions import bump_versions
+
+STARS = range(1, 11)
+
+COUNT_COLUMNS = [f"stars_{stars}" for stars in STARS] + ["spoilers"]
+
+# a movie without a row yet starts from the deltas themselves
+UPSERT_SQL = """
+    INSERT INTO movies_starhistogram (movie_id, {columns})
+    VALUES {rows}
+    ON CONFLICT (movie_id) DO UPDATE SET {increments}
+""".format(
+    columns=", ".join(COUNT_COLUMNS),
+    rows="{rows}",
+    increments=", ".join(
+        f"{column} = movies_starhistogram.{column} + excluded.{column}"
+        for column in COUNT_COLUMNS
+    ),
+)
+
+REBUILD_SQL = """
+    INSERT INTO movies_starhistogram (movie_id, {columns})
+    SELECT movie_id, {counts}
+    FROM movies_review
+    WHERE movie_id IS NOT NULL
+    GROUP BY movie_id
+""".format(
+    columns=", ".join(COUNT_COLUMNS),
+    counts=", ".join(
+        [f"SUM(CASE WHEN stars = {stars} THEN 1 ELSE 0 END)" for stars in STARS]
+        + ["SUM(CASE WHEN spoilers THEN 1 ELSE 0 END)"]
+    ),
+)
+
+
+def update_histograms(added=(), removed=()):
+    """
+    Apply the reviews added and removed, as (movie_id, stars, spoilers)
+    tuples, to the star histograms of their movies with a single upsert.
+    Call it inside the transaction that writes the reviews.
+    """
+    deltas = defaultdict(lambda: [0] * len(COUNT_COLUMNS))
+
+    for sign, reviews in ((1, added), (-1, removed)):
+        for movie_id, stars, spoilers in reviews:
+            if movie_id is not None:
+                deltas[movie_id][stars - 1] += sign
+                deltas[movie_id][-1] += sign * bool(spoilers)
+
+    rows = [[movie_id, *delta] for movie_id, delta in deltas.items() if any(delta)]
+
+    if not rows:
+        return
+
+    placeholders = "(%s)" % ", ".join(["%s"] * (len(COUNT_COLUMNS) + 1))
+    connection = connections[router.db_for_write(StarHistogram)]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_SQL.format(rows=", ".join([placeholders] * len(rows))),
+            [value for row in rows for value in row],
+        )
+
+
+def rebuild_histograms(using="default"):
+    """
+    Recompute every histogram from the reviews table in one INSERT ...
+    SELECT. Returns how many movies have one.
+    """
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute("DELETE FROM movies_starhistogram")
+        cursor.execute(REBUILD_SQL)
+        count = cursor.rowcount
+
+    bump_versions()
+
+    return count
+
+
+def get_movie_stats(counts):
+    """
+    The stats of a movie from its histogram `counts` (a dict with the
+    COUNT_COLUMNS, or None for a movie without reviews).
+    """
+    counts = counts or {}
+    histogram = {str(stars): counts.get(f"stars_{stars}", 0) for stars in STARS}
+    review_count = sum(histogram.values())
+
+    if not review_count:
+        return {
+            "review_count": 0,
+            "histogram": histogram,
+            "mean": None,
+            "median": None,
+            "spoiler_ratio": None,
+        }
+
+    # the two middle positions (the same one for an odd count), 1-based
+    middle = {(review_count + 1) // 2, review_count // 2 + 1}
+    medians = []
+    seen = 0
+
+    for stars in STARS:
+        count = histogram[str(stars)]
+        medians += [stars for position in middle if seen < position <= seen + count]
+        seen += count
+
+    return {
+        "review_count": review_count,
+        "histogram": histogram,
+        "mean": sum(stars * histogram[str(stars)] for stars in STARS) / review_count,
+        "median": sum(medians) / len(medians),
+        "spoiler_ratio": counts.get("spoilers", 0) / review_count,
+    }
@@ -0,0 +1,144 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import connections, transaction
+
+from movies.genres import genre_key, resolve_genres
+from movies.models import Genres, Movies
+from movies.serializers import MovieSerializer
+from movies.versions import bump_versions
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+CSV_CONTENT_TYPES = ("text/csv",)
+
+# genres column of CSV imports, e.g. "Crime|Drama"
+CSV_GENRES_SEPARATOR = "|"
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, {"detail": "Invalid JSON."}
+            continue
+
+        if not isinstance(row, dict):
+            yield line_number, None, {"detail": "Expected a JSON object."}
+            continue
+
+        yield line_number, row, None
+
+
+def read_csv(stream):
+    reader = csv.DictReader(line.decode("utf-8", "replace") for line in stream)
+
+    for row in reader:
+        names = (row.get("genres") or "").split(CSV_GENRES_SEPARATOR)
+        row["genres"] = [{"name": name.strip()} for name in names if name.strip()]
+
+        yield reader.line_num, row, None
+
+
+def get_reader(content_type):
+    content_type = content_type.split(";")[0].strip().lower()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        return read_ndjson
+
+    if content_type in CSV_CONTENT_TYPES:
+        return read_csv
+
+    return None
+
+
+def import_movies(rows, batch_size):
+    """
+    Validate and insert `(line, row, error)` tuples `batch_size` at a time,
+    one transaction per batch. Returns the number of movies created and the
+    errors of the rejected rows.
+    """
+    created = 0
+    errors = []
+    rows = iter(rows)
+
+    while True:
+        batch = list(islice(rows, batch_size))
+
+        if not batch:
+            return created, errors
+
+        valid = []
+
+        for line, row, error in batch:
+            if error is None:
+                serializer = MovieSerializer(data=row)
+
+                if serializer.is_valid():
+                    valid.append(serializer.validated_data)
+                    continue
+
+                error = serializer.errors
+
+            errors.append({"line": line, "errors": error})
+
+        if valid:
+            insert_movies(valid)
+            created += len(valid)
+
+
+def insert_movies(validated_data):
+    with transaction.atomic():
+        movies = create_movies(
+            [
+                Movies(**{key: value for key, value in data.items() if key != "genres"})
+                for data in validated_data
+            ]
+        )
+
+        genres = {
+            genre_key(genre.name): genre
+            for genre in resolve_genres(
+                genre["name"] for data in validated_data for genre in data["genres"]
+            )
+        }
+
+        Through = Genres.movies.through
+        Through.objects.bulk_create(
+            [
+                Through(
+                    movies_id=movie.id, genres_id=genres[genre_key(genre["name"])].id
+                )
+                for movie, data in zip(movies, validated_data)
+                for genre in data["genres"]
+            ],
+            ignore_conflicts=True,
+        )
+
+        bump_versions()
+
+    return movies
+
+
+def create_movies(movies):
+    connection = connections[Movies.objects.db]
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Movies.objects.bulk_create(movies)
+
+    Movies.objects.bulk_create(movies)
+
+    # SQLite has a single writer: from the first INSERT until the commit no
+    # one else can add rows, so the newest ids are exactly the ones created.
+    ids = list(
+        Movies.objects.order_by("-id").values_list("id", flat=True)[: len(movies)]
+    )
+
+    for movie, movie_id in zip(movies, reversed(ids)):
+        movie.id = movie_id
+
+    return movies
@@ -0,0 +1,82 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.benchmark import BenchmarkRunner, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every API route against a seeded catalog and compare the results "
+        "with the previous run. The database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--movies", type=int, default=1000)
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--genres-per-movie", type=int, default=2)
+        parser.add_argument("--critics", type=int, default=50)
+        parser.add_argument("--reviews-per-movie", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            default="benchmark.json",
+            help="Where the results are written. An existing file is used as "
+            "the baseline unless --baseline is given.",
+        )
+        parser.add_argument("--baseline", help="Results to compare against.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed p95 slowdown before failing, as a fraction.",
+        )
+
+    def handle(self, *args, **options):
+        baseline_path = options["baseline"] or options["output"]
+        previous = None
+
+        if os.path.exists(baseline_path):
+            with open(baseline_path) as baseline_file:
+                previous = json.load(baseline_file)
+
+        runner = BenchmarkRunner(
+            iterations=options["iterations"],
+            movies=options["movies"],
+            genres=options["genres"],
+            genres_per_movie=options["genres_per_movie"],
+            critics=options["critics"],
+            reviews_per_movie=options["reviews_per_movie"],
+            seed=options["seed"],
+        )
+        current = runner.run()
+
+        self.stdout.write(
+            f"{'route':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}"
+        )
+        for name, result in current["results"].items():
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['queries']:>9}"
+            )
+
+        with open(options["output"], "w") as output_file:
+            json.dump(current, output_file, indent=2)
+
+        if previous is None:
+            return
+
+        if previous["settings"] != current["settings"]:
+            self.stdout.write(
+                self.style.WARNING("Baseline was run with other settings, skipped.")
+            )
+            return
+
+        regressions = compare(previous, current, options["threshold"])
+
+        if regressions:
+            raise CommandError("Regressions found:\n" + "\n".join(regressions))
+
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from movies.sqlite_benchmark import SQLiteConcurrencyBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the SQLite profiles of settings.SQLITE_PROFILES with concurrent "
+        "readers and review writers on scratch database files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--movies", type=int, default=1000)
+        parser.add_argument("--profile", action="append", dest="profiles")
+        parser.add_argument("--output", help="Also write the results as JSON.")
+
+    def handle(self, *args, **options):
+        report = SQLiteConcurrencyBenchmark(
+            readers=options["readers"],
+            writers=options["writers"],
+            seconds=options["seconds"],
+            movies=options["movies"],
+        ).run(options["profiles"])
+
+        self.stdout.write(
+            f"{'profile':<14}{'reads/s':>10}{'read p95':>10}{'writes/s':>10}"
+            f"{'write p95':>11}{'locked':>8}"
+        )
+        for name, result in report["results"].items():
+            read, write = result["read"], result["write"]
+            self.stdout.write(
+                f"{name:<14}{read['per_second']:>10}{read['p95_ms']:>10}"
+                f"{write['per_second']:>10}{write['p95_ms']:>11}"
+                f"{read['locked'] + write['locked']:>8}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                json.dump(report, output_file, indent=2)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from movies.exporter import export_catalog
+
+
+class Command(BaseCommand):
+    help = "Export every movie with its genres and reviews as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o", "--output", help="File to write to. Defaults to stdout."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Movies loaded per query batch.",
+        )
+
+    def handle(self, *args, output=None, chunk_size=500, **options):
+        if not output:
+            for data in export_catalog(chunk_size):
+                self.stdout.write(data.decode(), ending="")
+            return
+
+        with open(output, "wb") as stream:
+            for data in export_catalog(chunk_size):
+                stream.write(data)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from movies.histograms import rebuild_histograms
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the star histogram of every movie from its reviews, e.g. "
+        "after reviews were written outside the API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        count = rebuild_histograms(using=options["database"])
+
+        self.stdout.write(f"Rebuilt the star histograms of {count} movies.")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from movies.seeding import SEED_PASSWORD, seed_catalog
+
+
+class Command(BaseCommand):
+    help = "Insert a deterministic catalog of movies, genres, critics and reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movies", type=int, default=1000)
+        parser.add_argument("--genres", type=int, default=20)
+        parser.add_argument("--genres-per-movie", type=int, default=2)
+        parser.add_argument("--critics", type=int, default=50)
+        parser.add_argument("--reviews-per-movie", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        seed_catalog(
+            movies=options["movies"],
+            genres=options["genres"],
+            genres_per_movie=options["genres_per_movie"],
+            critics=options["critics"],
+            reviews_per_movie=options["reviews_per_movie"],
+            seed=options["seed"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {options['movies']} movies. "
+                f"Critics log in with password {SEED_PASSWORD!r}."
+            )
+        )
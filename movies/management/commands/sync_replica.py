@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over a replica alias, so a second "
+        "SQLite file can stand in for a read replica locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="replica")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+
+        if alias == "default" or alias not in settings.DATABASES:
+            raise CommandError(f"Unknown replica alias {alias!r}.")
+
+        primary = connections["default"]
+        primary.ensure_connection()
+        connections[alias].close()
+
+        target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+        self.stdout.write(f"Copied the primary database to {alias!r}.")
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from movies.search import (
+    create_search_table,
+    drop_search_index,
+    rebuild_search_index,
+    supports_search_index,
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+
+    if supports_search_index(connection):
+        # triggers are installed by the post_migrate handler, see movies.signals
+        create_search_table(connection)
+        rebuild_search_index(connection)
+
+
+def remove_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+
+    if supports_search_index(connection):
+        drop_search_index(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0003_alter_review_movie"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, remove_search_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.9 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movies = apps.get_model("movies", "Movies")
+    Review = apps.get_model("movies", "Review")
+
+    ratings = (
+        Review.objects.exclude(movie=None)
+        .values("movie_id")
+        .annotate(count=Count("id"), total=Sum("stars"), average=Avg("stars"))
+    )
+
+    for rating in ratings.iterator():
+        Movies.objects.filter(pk=rating["movie_id"]).update(
+            review_count=rating["count"],
+            stars_sum=rating["total"],
+            average_stars=rating["average"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0004_movies_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movies",
+            name="average_stars",
+            field=models.FloatField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="movies",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="movies",
+            name="stars_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.9 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+NOCASE = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def merge_duplicated_genres(apps, schema_editor):
+    Genres = apps.get_model("movies", "Genres")
+    Through = Genres.movies.through
+
+    kept = {}
+
+    for genre in Genres.objects.order_by("id"):
+        key = genre.name.translate(NOCASE)
+
+        if key not in kept:
+            kept[key] = genre
+            continue
+
+        movie_ids = Through.objects.filter(genres_id=genre.id).values_list(
+            "movies_id", flat=True
+        )
+        Through.objects.bulk_create(
+            [
+                Through(genres_id=kept[key].id, movies_id=movie_id)
+                for movie_id in movie_ids
+            ],
+            ignore_conflicts=True,
+        )
+        genre.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0005_movies_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicated_genres, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="genres",
+            name="name",
+            field=models.CharField(db_collation="NOCASE", max_length=255, unique=True),
+        ),
+    ]
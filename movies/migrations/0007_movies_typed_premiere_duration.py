@@ -0,0 +1,115 @@
+from datetime import date, datetime
+
+from django.db import migrations, models
+
+from movies.durations import MAX_MINUTES, parse_minutes
+
+# a bare year is reported, not turned into January 1st
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y"]
+
+
+def parse_premiere(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+
+    return None
+
+
+def parse_duration(value):
+    minutes = parse_minutes(value)
+
+    if minutes is None or minutes > MAX_MINUTES:
+        return None
+
+    return minutes
+
+
+def convert_premiere_and_duration(apps, schema_editor):
+    Movies = apps.get_model("movies", "Movies")
+
+    invalid = []
+
+    for movie in Movies.objects.only("id", "premiere", "duration").iterator():
+        premiere = parse_premiere(movie.premiere)
+        duration = parse_duration(movie.duration)
+
+        if premiere is None or duration is None:
+            invalid.append(f"{movie.id} ({movie.premiere!r}, {movie.duration!r})")
+            continue
+
+        Movies.objects.filter(id=movie.id).update(
+            premiere_date=premiere, duration_minutes=duration
+        )
+
+    if invalid:
+        raise ValueError(
+            "Fix the premiere/duration of these movies before migrating: "
+            + ", ".join(invalid)
+        )
+
+
+def restore_premiere_and_duration(apps, schema_editor):
+    Movies = apps.get_model("movies", "Movies")
+
+    for movie in Movies.objects.only("id", "premiere_date", "duration_minutes"):
+        Movies.objects.filter(id=movie.id).update(
+            premiere=movie.premiere_date.isoformat(),
+            duration=f"{movie.duration_minutes}m",
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0006_genres_name_unique_nocase"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="movies",
+            name="premiere_date",
+            field=models.DateField(default=date.min),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="movies",
+            name="duration_minutes",
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            convert_premiere_and_duration, restore_premiere_and_duration
+        ),
+        # a default lets the old columns be re-added when migrating backwards
+        migrations.AlterField(
+            model_name="movies",
+            name="premiere",
+            field=models.CharField(max_length=255, default=""),
+        ),
+        migrations.AlterField(
+            model_name="movies",
+            name="duration",
+            field=models.CharField(max_length=255, default=""),
+        ),
+        migrations.RemoveField(model_name="movies", name="premiere"),
+        migrations.RemoveField(model_name="movies", name="duration"),
+        migrations.RenameField(
+            model_name="movies", old_name="premiere_date", new_name="premiere"
+        ),
+        migrations.RenameField(
+            model_name="movies", old_name="duration_minutes", new_name="duration"
+        ),
+        migrations.AlterField(
+            model_name="movies",
+            name="premiere",
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="movies",
+            name="duration",
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+    ]
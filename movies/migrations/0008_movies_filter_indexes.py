@@ -0,0 +1,30 @@
+# Generated by Django 3.2.9 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0007_movies_typed_premiere_duration"),
+    ]
+
+    operations = [
+        # Django only indexes (genres_id, movies_id) and each column alone;
+        # the reverse pair lets movie -> genres lookups skip the table.
+        migrations.RunSQL(
+            "CREATE INDEX movies_genres_movies_movies_id_genres_id_idx "
+            "ON movies_genres_movies (movies_id, genres_id)",
+            "DROP INDEX movies_genres_movies_movies_id_genres_id_idx",
+        ),
+        migrations.AlterField(
+            model_name="movies",
+            name="average_stars",
+            field=models.FloatField(db_index=True, default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name="movies",
+            name="classification",
+            field=models.IntegerField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.9 on 2026-10-18 12:12
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Sum
+
+
+def delete_duplicated_reviews(apps, schema_editor):
+    Movies = apps.get_model("movies", "Movies")
+    Review = apps.get_model("movies", "Review")
+
+    # keeps the newest review of every (critic, movie) pair
+    duplicated = (
+        Review.objects.exclude(critic=None)
+        .exclude(movie=None)
+        .values("critic_id", "movie_id")
+        .annotate(count=Count("id"), newest=Max("id"))
+        .filter(count__gt=1)
+    )
+    movie_ids = set()
+
+    for pair in duplicated:
+        Review.objects.filter(
+            critic_id=pair["critic_id"], movie_id=pair["movie_id"]
+        ).exclude(id=pair["newest"]).delete()
+        movie_ids.add(pair["movie_id"])
+
+    ratings = (
+        Review.objects.filter(movie_id__in=movie_ids)
+        .values("movie_id")
+        .annotate(count=Count("id"), total=Sum("stars"), average=Avg("stars"))
+    )
+
+    for rating in ratings:
+        Movies.objects.filter(pk=rating["movie_id"]).update(
+            review_count=rating["count"],
+            stars_sum=rating["total"],
+            average_stars=rating["average"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0008_movies_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicated_reviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="review",
+            constraint=models.UniqueConstraint(
+                fields=("critic", "movie"), name="movies_review_unique_critic_movie"
+            ),
+        ),
+    ]
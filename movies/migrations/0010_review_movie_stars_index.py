@@ -0,0 +1,19 @@
+# Generated by Django 3.2.9 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0009_review_unique_critic_movie"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["movie", "stars", "id"], name="movies_review_movie_stars"
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.9 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def build_histograms(apps, schema_editor):
+    Review = apps.get_model("movies", "Review")
+    StarHistogram = apps.get_model("movies", "StarHistogram")
+
+    counts = (
+        Review.objects.exclude(movie=None)
+        .values("movie_id")
+        .annotate(
+            **{
+                f"stars_{stars}": Count("id", filter=Q(stars=stars))
+                for stars in range(1, 11)
+            },
+            spoilers_count=Count("id", filter=Q(spoilers=True)),
+        )
+        .order_by()
+    )
+
+    StarHistogram.objects.bulk_create(
+        (
+            StarHistogram(spoilers=row.pop("spoilers_count"), **row)
+            for row in counts.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("movies", "0010_review_movie_stars_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StarHistogram",
+            fields=[
+                (
+                    "movie",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="histogram",
+                        serialize=False,
+                        to="movies.movies",
+                    ),
+                ),
+                ("stars_1", models.IntegerField(default=0)),
+                ("stars_2", models.IntegerField(default=0)),
+                ("stars_3", models.IntegerField(default=0)),
+                ("stars_4", models.IntegerField(default=0)),
+                ("stars_5", models.IntegerField(default=0)),
+                ("stars_6", models.IntegerField(default=0)),
+                ("stars_7", models.IntegerField(default=0)),
+                ("stars_8", models.IntegerField(default=0)),
+                ("stars_9", models.IntegerField(default=0)),
+                ("stars_10", models.IntegerField(default=0)),
+                ("spoilers", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_histograms, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,20 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 
 class Movies(models.Model):
     title = models.CharField(max_length=255)
-    duration = models.CharField(max_length=255)
-    premiere = models.CharField(max_length=255)
-    classification = models.IntegerField()
+    # minutes, rendered as "175m" by the API
+    duration = models.PositiveIntegerField(db_index=True)
+    premiere = models.DateField(db_index=True)
+    classification = models.IntegerField(db_index=True)
     synopsis = models.CharField(max_length=511)
 
+    # kept up to date by movies.ratings on every review write
+    review_count = models.PositiveIntegerField(default=0)
+    stars_sum = models.PositiveIntegerField(default=0)
+    average_stars = models.FloatField(null=True, default=None, db_index=True)
+
 
 class Review(models.Model):
     stars = models.IntegerField(
@@ -22,8 +28,53 @@ class Review(models.Model):
     )
     critic = models.ForeignKey("accounts.User", on_delete=models.PROTECT, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["critic", "movie"], name="movies_review_unique_critic_movie"
+            )
+        ]
+        # nested reviews by stars (movies.nested_reviews) read it in order
+        indexes = [
+            models.Index(
+                fields=["movie", "stars", "id"], name="movies_review_movie_stars"
+            )
+        ]
+
+    def delete(self, *args, **kwargs):
+        # Reviews removed by the movie cascade skip this on purpose: their
+        # aggregates are deleted together with the movie row.
+        from movies.histograms import update_histograms
+        from movies.ratings import update_movie_rating
+
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            update_movie_rating(self.movie_id, removed=[self.stars])
+            update_histograms(removed=[(self.movie_id, self.stars, self.spoilers)])
+
+        return deleted
+
+
+class StarHistogram(models.Model):
+    # how many reviews of the movie gave each number of stars, kept up to
+    # date by movies.histograms on every review write
+    movie = models.OneToOneField(
+        Movies, on_delete=models.CASCADE, primary_key=True, related_name="histogram"
+    )
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+    stars_6 = models.IntegerField(default=0)
+    stars_7 = models.IntegerField(default=0)
+    stars_8 = models.IntegerField(default=0)
+    stars_9 = models.IntegerField(default=0)
+    stars_10 = models.IntegerField(default=0)
+    spoilers = models.IntegerField(default=0)
+
 
 class Genres(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True, db_collation="NOCASE")
 
     movies = models.ManyToManyField(Movies, related_name="genres")
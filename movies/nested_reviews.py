@@ -0,0 +1,51 @@
+from django.db.models.expressions import RawSQL
+
+from movies.models import Review
+from movies.pagination import ReviewPagination
+
+RANKED_REVIEWS_SQL = """
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY movie_id ORDER BY {order}) AS position
+        FROM movies_review
+        WHERE movie_id IN ({movies})
+    ) AS ranked
+    WHERE position <= %s
+"""
+
+
+def get_review_ordering(ordering):
+    if ordering in ReviewPagination.orderings:
+        return ordering
+
+    return ReviewPagination.default_ordering
+
+
+def top_reviews(movie_ids, ordering, limit):
+    """
+    Reviews queryset with the first `limit` reviews of each movie in
+    `ordering` (a ReviewPagination ordering), sorted by movie. A single movie
+    is cut with LIMIT, which walks the (movie, ...) index and stays flat
+    however many reviews the movie has; a page of movies is ranked by a
+    ROW_NUMBER window over their reviews.
+    """
+    fields = ReviewPagination.orderings[ordering]
+
+    if len(movie_ids) == 1:
+        # "=" rather than IN, so the rows come out of the index in order
+        top = (
+            Review.objects.filter(movie_id=movie_ids[0])
+            .order_by(*fields)
+            .values("id")[:limit]
+        )
+    else:
+        order = ", ".join(
+            f"{field[1:]} DESC" if field.startswith("-") else field for field in fields
+        )
+        top = RawSQL(
+            RANKED_REVIEWS_SQL.format(
+                order=order, movies=", ".join(["%s"] * len(movie_ids))
+            ),
+            [*movie_ids, limit],
+        )
+
+    return Review.objects.filter(id__in=top).order_by("movie_id", *fields)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from rest_framework.utils.urls import replace_query_param
+from utils.pagination import KeysetPagination
+
+from movies.search import SEARCH_RANK
+
+
+class MoviePagination(KeysetPagination):
+    orderings = {
+        "id": ("id",),
+        "premiere": ("premiere", "id"),
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # full-text results are paged in relevance order by default
+        if SEARCH_RANK in queryset.query.annotations:
+            self.orderings = {"rank": (SEARCH_RANK, "id"), **self.orderings}
+            self.default_ordering = "rank"
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ReviewPagination(KeysetPagination):
+    page_size = 50
+
+    orderings = {
+        "recent": ("-id",),
+        "stars": ("-stars", "-id"),
+    }
+    default_ordering = settings.MOVIE_REVIEWS_ORDERING
+
+    def get_link_after(self, url, ordering, review):
+        """
+        Link to the page that follows `review` (a serialized review) in
+        `ordering`.
+        """
+        self.ordering = ordering
+        position = [review[field.lstrip("-")] for field in self.orderings[ordering]]
+        url = replace_query_param(url, self.ordering_query_param, ordering)
+
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(position)
+        )
@@ -0,0 +1,54 @@
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast, NullIf
+
+from movies.models import Movies
+from movies.versions import bump_versions
+
+
+def update_movie_rating(movie_id, added=(), removed=()):
+    """
+    Apply the stars of added/removed reviews to the movie aggregates with a
+    single UPDATE, so concurrent writers never lose an increment. Call it
+    inside the transaction that writes the reviews.
+    """
+    stars_delta = sum(added) - sum(removed)
+    count_delta = len(added) - len(removed)
+
+    if movie_id is None or (not stars_delta and not count_delta):
+        return
+
+    stars_sum = F("stars_sum") + stars_delta
+    review_count = F("review_count") + count_delta
+
+    Movies.objects.filter(pk=movie_id).update(
+        stars_sum=stars_sum,
+        review_count=review_count,
+        average_stars=Cast(stars_sum, FloatField()) / NullIf(review_count, 0),
+    )
+    bump_versions(movie_id)
+
+
+def add_movie_ratings(stars_by_movie):
+    """
+    update_movie_rating(movie_id, added=[stars]) for many movies with one
+    UPDATE, e.g. `{movie_id: stars}` for a batch of new reviews.
+    """
+    if not stars_by_movie:
+        return
+
+    stars_sum = F("stars_sum") + Case(
+        *(
+            When(pk=movie_id, then=Value(stars))
+            for movie_id, stars in stars_by_movie.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    review_count = F("review_count") + 1
+
+    Movies.objects.filter(pk__in=stars_by_movie).update(
+        stars_sum=stars_sum,
+        review_count=review_count,
+        average_stars=Cast(stars_sum, FloatField()) / NullIf(review_count, 0),
+    )
+    bump_versions(*stars_by_movie)
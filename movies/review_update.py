@@ -0,0 +1,118 @@
+from django.db import connections, router, transaction
+from django.http import Http404
+
+from movies.histograms import update_histograms
+from movies.models import Review
+from movies.versions import bump_versions
+
+# the old stars are read by the subquery before the review row changes; a
+# missing review or no new stars leave the aggregates as they are
+MOVIE_SQL = """
+    UPDATE movies_movies
+    SET stars_sum = stars_sum + {delta},
+        average_stars = CAST(stars_sum + {delta} AS REAL) / NULLIF(review_count, 0)
+    WHERE id = %s
+"""
+
+STARS_DELTA_SQL = """coalesce(%s - (
+    SELECT stars FROM movies_review
+    WHERE critic_id = %s AND movie_id = movies_movies.id
+), 0)"""
+
+# evaluated before the review row changes too: its old values, NULL when the
+# critic has no review of the movie
+OLD_REVIEW_SQL = """
+    (SELECT {column} FROM movies_review
+    WHERE critic_id = %s AND movie_id = movies_movies.id)
+"""
+
+REVIEW_SQL = """
+    UPDATE movies_review
+    SET {assignments}
+    WHERE critic_id = %s AND movie_id = %s
+"""
+
+REVIEW_COLUMNS = ["id", "stars", "review", "spoilers"]
+
+
+def supports_returning(connection):
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+
+    return connection.vendor == "postgresql"
+
+
+def update_review(critic, movie_id, data):
+    """
+    Apply the validated `data` to the review of `critic` for the movie and
+    return it. Where the backend supports RETURNING this is one UPDATE of
+    the movie rating, which also returns the old review (or tells that the
+    movie or the review is missing), one UPDATE of the review scoped to
+    (critic, movie) returning the new row, and one upsert of the histogram
+    when the stars or spoilers change. Elsewhere the old review is read
+    first. Raises Http404 for a missing movie or review.
+    """
+    connection = connections[router.db_for_write(Review)]
+    returning = supports_returning(connection)
+
+    stars = data.get("stars")
+    movie_sql = MOVIE_SQL.format(delta=STARS_DELTA_SQL)
+    movie_params = [stars, critic.id, stars, critic.id, movie_id]
+    assignments = [f"{field} = %s" for field in data] or ["stars = stars"]
+    review_sql = REVIEW_SQL.format(assignments=", ".join(assignments))
+
+    if returning:
+        movie_sql += " RETURNING " + ", ".join(
+            OLD_REVIEW_SQL.format(column=column) for column in REVIEW_COLUMNS
+        )
+        movie_params += [critic.id] * len(REVIEW_COLUMNS)
+        review_sql += f" RETURNING {', '.join(REVIEW_COLUMNS)}"
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(movie_sql, movie_params)
+
+        if returning:
+            old = cursor.fetchone()
+
+            if old is None:
+                raise Http404("No movie matches the given query.")
+        else:
+            if cursor.rowcount == 0:
+                raise Http404("No movie matches the given query.")
+
+            cursor.execute(
+                f"SELECT {', '.join(REVIEW_COLUMNS)} FROM movies_review "
+                "WHERE critic_id = %s AND movie_id = %s",
+                [critic.id, movie_id],
+            )
+            old = cursor.fetchone() or [None] * len(REVIEW_COLUMNS)
+
+        if old[0] is None:
+            raise Http404("No review matches the given query.")
+
+        cursor.execute(review_sql, [*data.values(), critic.id, movie_id])
+
+        if returning:
+            row = cursor.fetchone()
+        else:
+            row = [
+                data.get(column, value) for column, value in zip(REVIEW_COLUMNS, old)
+            ]
+
+        _, old_stars, _, old_spoilers = old
+        review_id, stars, text, spoilers = row
+
+        update_histograms(
+            added=[(movie_id, stars, spoilers)],
+            removed=[(movie_id, old_stars, old_spoilers)],
+        )
+        bump_versions(movie_id)
+
+    return Review(
+        id=review_id,
+        movie_id=movie_id,
+        critic=critic,
+        stars=stars,
+        review=text,
+        spoilers=bool(spoilers),
+    )
@@ -0,0 +1,145 @@
+import re
+
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "movies_movies_fts"
+
+SEARCH_RANK = "search_rank"
+
+# bm25 column weights: title, synopsis, genres
+RANK_SQL = f"bm25({FTS_TABLE}, 10.0, 1.0, 5.0)"
+
+GENRE_NAMES_SQL = """
+    SELECT coalesce(group_concat(g.name, ' '), '')
+    FROM movies_genres g
+    JOIN movies_genres_movies gm ON gm.genres_id = g.id
+    WHERE gm.movies_id = {movie_id}
+"""
+
+CREATE_TABLE_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+    USING fts5(title, synopsis, genres, tokenize = 'unicode61 remove_diacritics 2')
+"""
+
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_movies_fts_insert
+    AFTER INSERT ON movies_movies BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, synopsis, genres)
+        VALUES (new.id, new.title, new.synopsis, '');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_movies_fts_update
+    AFTER UPDATE OF title, synopsis ON movies_movies BEGIN
+        UPDATE {FTS_TABLE} SET title = new.title, synopsis = new.synopsis
+        WHERE rowid = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_movies_fts_delete
+    AFTER DELETE ON movies_movies BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_genres_movies_fts_insert
+    AFTER INSERT ON movies_genres_movies BEGIN
+        UPDATE {FTS_TABLE}
+        SET genres = ({GENRE_NAMES_SQL.format(movie_id="new.movies_id")})
+        WHERE rowid = new.movies_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_genres_movies_fts_delete
+    AFTER DELETE ON movies_genres_movies BEGIN
+        UPDATE {FTS_TABLE}
+        SET genres = ({GENRE_NAMES_SQL.format(movie_id="old.movies_id")})
+        WHERE rowid = old.movies_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_genres_fts_update
+    AFTER UPDATE OF name ON movies_genres BEGIN
+        UPDATE {FTS_TABLE}
+        SET genres = ({GENRE_NAMES_SQL.format(movie_id=f"{FTS_TABLE}.rowid")})
+        WHERE rowid IN (
+            SELECT movies_id FROM movies_genres_movies WHERE genres_id = new.id
+        );
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    "movies_movies_fts_insert",
+    "movies_movies_fts_update",
+    "movies_movies_fts_delete",
+    "movies_genres_movies_fts_insert",
+    "movies_genres_movies_fts_delete",
+    "movies_genres_fts_update",
+]
+
+REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, synopsis, genres)
+    SELECT m.id, m.title, m.synopsis, ({GENRE_NAMES_SQL.format(movie_id="m.id")})
+    FROM movies_movies m
+    """,
+]
+
+
+def supports_search_index(connection):
+    return connection.vendor == "sqlite"
+
+
+def create_search_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+
+
+def install_search_triggers(connection):
+    with connection.cursor() as cursor:
+        for sql in TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_triggers(connection):
+    with connection.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_search_index(connection):
+    with connection.cursor() as cursor:
+        for sql in REBUILD_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_index(connection):
+    drop_search_triggers(connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def build_match_expression(value):
+    # Every word becomes a quoted prefix term, so user input can never be
+    # parsed as FTS5 query syntax.
+    words = re.findall(r"\w+", value)
+
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_movies(queryset, value):
+    match = build_match_expression(value)
+
+    if not match:
+        return queryset
+
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = movies_movies.id", f"{FTS_TABLE} MATCH %s"],
+        params=[match],
+    ).annotate(**{SEARCH_RANK: RawSQL(RANK_SQL, (), output_field=FloatField())})
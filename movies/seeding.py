@@ -0,0 +1,125 @@
+import random
+from datetime import date
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import User
+from movies.genres import resolve_genres
+from movies.histograms import rebuild_histograms
+from movies.importer import create_movies
+from movies.models import Genres, Movies, Review
+from movies.versions import bump_versions
+
+SEED_PASSWORD = "1234"
+
+BATCH_SIZE = 1000
+
+
+def seed_catalog(
+    movies=1000,
+    genres=20,
+    genres_per_movie=2,
+    critics=50,
+    reviews_per_movie=5,
+    seed=0,
+):
+    """
+    Insert a dataset that only depends on the arguments: the same call on an
+    empty database always produces the same rows. Every seeded user has
+    SEED_PASSWORD as password.
+    """
+    rng = random.Random(seed)
+    genres_per_movie = min(genres_per_movie, genres)
+    reviews_per_movie = min(reviews_per_movie, critics)
+
+    with transaction.atomic():
+        genre_objects = resolve_genres(f"Seed genre {index}" for index in range(genres))
+
+        password = make_password(SEED_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"seed-critic-{seed}-{index}",
+                    password=password,
+                    first_name="Critic",
+                    last_name=str(index),
+                    is_staff=True,
+                )
+                for index in range(critics)
+            ],
+            ignore_conflicts=True,
+        )
+        critic_ids = list(
+            User.objects.filter(username__startswith=f"seed-critic-{seed}-")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        for start in range(0, movies, BATCH_SIZE):
+            seed_movies(
+                rng,
+                range(start, min(start + BATCH_SIZE, movies)),
+                genre_objects,
+                genres_per_movie,
+                critic_ids,
+                reviews_per_movie,
+            )
+
+        rebuild_histograms()
+        bump_versions()
+
+
+def seed_movies(rng, indexes, genres, genres_per_movie, critic_ids, reviews_per_movie):
+    movies = []
+    reviews = []
+
+    for index in indexes:
+        stars = [rng.randint(1, 10) for _ in range(reviews_per_movie)]
+
+        movies.append(
+            Movies(
+                title=f"Seed movie {index}",
+                duration=rng.randint(80, 200),
+                premiere=date(
+                    rng.randint(1950, 2021), rng.randint(1, 12), rng.randint(1, 28)
+                ),
+                classification=rng.choice([0, 10, 12, 14, 16, 18]),
+                synopsis=f"Synopsis of seed movie {index}",
+                review_count=len(stars),
+                stars_sum=sum(stars),
+                average_stars=sum(stars) / len(stars) if stars else None,
+            )
+        )
+        reviews.append(
+            [
+                Review(
+                    critic_id=critic_id,
+                    stars=value,
+                    review=f"Review {position} of seed movie {index}",
+                    spoilers=rng.random() < 0.2,
+                )
+                for position, (critic_id, value) in enumerate(
+                    zip(rng.sample(critic_ids, len(stars)), stars)
+                )
+            ]
+        )
+
+    movies = create_movies(movies)
+    links = []
+
+    for movie, movie_reviews in zip(movies, reviews):
+        links += [
+            Genres.movies.through(movies_id=movie.id, genres_id=genre.id)
+            for genre in rng.sample(genres, genres_per_movie)
+        ]
+
+        for review in movie_reviews:
+            review.movie_id = movie.id
+
+    Genres.movies.through.objects.bulk_create(links, batch_size=BATCH_SIZE)
+
+    Review.objects.bulk_create(
+        [review for movie_reviews in reviews for review in movie_reviews],
+        batch_size=BATCH_SIZE,
+    )
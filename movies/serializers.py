@@ -1,18 +1,45 @@
 import ipdb
 from accounts.models import User
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from movies.durations import MAX_MINUTES, parse_minutes
+from movies.genres import link_genres, resolve_genres
+from movies.histograms import update_histograms
 from movies.models import Genres, Movies, Review
+from movies.ratings import update_movie_rating
 
 ValidationError.status_code = 422
 
 
+class MinutesField(serializers.IntegerField):
+    # "175m", "2h55m" or a plain number of minutes; always rendered as "175m"
+    default_error_messages = {
+        "invalid": 'Use minutes, like "175m", "175" or "2h55m".',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = parse_minutes(data)
+
+            if data is None:
+                self.fail("invalid")
+
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        return f"{value}m"
+
+
 class GenresSerializer(serializers.ModelSerializer):
     class Meta:
         model = Genres
         fields = ["id", "name"]
 
+        # existing names are reused by MovieSerializer, not rejected
+        extra_kwargs = {"name": {"validators": []}}
+
 
 class CriticSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,57 +57,75 @@ class ReviewSerializer(serializers.ModelSerializer):
         extra_kwargs = {"movie": {"write_only": True}}
 
     def create(self, validated_data):
-        check_already_reviewed = Review.objects.filter(
-            critic_id=self.context["request"].user.id
-        ).filter(movie_id=validated_data["movie"].id)
+        critic = self.context["request"].user
+
+        # the unique (critic, movie) constraint is the check, no SELECT first
+        try:
+            with transaction.atomic():
+                review = Review.objects.create(**validated_data, critic=critic)
+                update_movie_rating(review.movie_id, added=[review.stars])
+                update_histograms(
+                    added=[(review.movie_id, review.stars, review.spoilers)]
+                )
+        except IntegrityError:
+            if Review.objects.filter(
+                critic_id=critic.id, movie_id=validated_data["movie"].id
+            ).exists():
+                raise ValidationError({"detail": "You already made this review."})
+
+            raise
+
+        return review
 
-        if check_already_reviewed:
-            raise ValidationError({"detail": "You already made this review."})
 
-        return Review.objects.create(
-            **validated_data, critic=self.context["request"].user
-        )
+class BulkReviewSerializer(serializers.ModelSerializer):
+    # ids past the 64-bit column range would overflow the lookup
+    movie_id = serializers.IntegerField(min_value=1, max_value=2**63 - 1)
+
+    class Meta:
+        model = Review
+        fields = ["movie_id", "stars", "review", "spoilers"]
+
+
+class ReviewUpdateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Review
+        fields = ["stars", "review", "spoilers"]
 
 
 class MovieWithReviewSerializer(serializers.ModelSerializer):
     reviews = ReviewSerializer(many=True, read_only=True)
     genres = GenresSerializer(many=True, read_only=True)
+    duration = MinutesField(min_value=0, max_value=MAX_MINUTES)
 
     class Meta:
         model = Movies
-        fields = "__all__"
+        exclude = ["stars_sum"]
+        read_only_fields = ["review_count", "average_stars"]
 
 
 class MovieSerializer(serializers.ModelSerializer):
     genres = GenresSerializer(many=True)
+    duration = MinutesField(min_value=0, max_value=MAX_MINUTES)
 
     class Meta:
         model = Movies
-        fields = "__all__"
+        exclude = ["stars_sum"]
+        read_only_fields = ["review_count", "average_stars"]
 
     def create(self, validated_data):
         genres = validated_data.pop("genres")
-        movie = Movies.objects.create(**validated_data)
 
-        for genre in genres:
-            get_genre = Genres.objects.filter(name=genre["name"]).first()
-            if get_genre:
-                movie.genres.add(get_genre)
-            else:
-                new_genre = Genres.objects.create(**genre)
-                movie.genres.add(new_genre)
+        with transaction.atomic():
+            movie = Movies.objects.create(**validated_data)
+            link_genres(movie, resolve_genres(genre["name"] for genre in genres))
 
         return movie
 
     def update(self, instance, validated_data):
-        genres = validated_data.pop("genres")
+        genres = validated_data.pop("genres", [])
 
-        for genre in genres:
-            get_genre = Genres.objects.filter(name=genre["name"]).first()
-            if get_genre:
-                instance.genres.add(get_genre)
-            else:
-                new_genre = Genres.objects.create(**genre)
-                instance.genres.add(new_genre)
+        with transaction.atomic():
+            link_genres(instance, resolve_genres(genre["name"] for genre in genres))
 
-        return super().update(instance, validated_data)
+            return super().update(instance, validated_data)
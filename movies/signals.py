@@ -0,0 +1,81 @@
+from django.db import connections
+
+from movies.models import Movies, Review
+from movies.search import (
+    FTS_TABLE,
+    drop_search_triggers,
+    install_search_triggers,
+    rebuild_search_index,
+    supports_search_index,
+)
+from movies.versions import bump_versions
+
+
+def suspend_search_index(sender, using, **kwargs):
+    # SQLite refuses to rebuild a table that a trigger refers to, and
+    # migrations rebuild tables for most schema changes.
+    connection = connections[using]
+
+    if supports_search_index(connection):
+        drop_search_triggers(connection)
+
+
+def restore_search_index(sender, using, plan=None, **kwargs):
+    connection = connections[using]
+
+    if not supports_search_index(connection):
+        return
+
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+
+    install_search_triggers(connection)
+
+    # data migrations ran without the triggers, so reindex what they touched
+    if any(
+        migration.app_label == sender.label and not backwards
+        for migration, backwards in plan or []
+    ):
+        rebuild_search_index(connection)
+
+
+def movie_changed(sender, instance, **kwargs):
+    bump_versions(instance.id)
+
+
+def genre_changed(sender, instance, created=False, **kwargs):
+    if created:
+        bump_versions()
+        return
+
+    bump_versions(*instance.movies.values_list("id", flat=True))
+
+
+def genre_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    if isinstance(instance, Movies):
+        bump_versions(instance.id)
+    else:
+        bump_versions(*(pk_set or ()))
+
+
+def review_saved(sender, instance, **kwargs):
+    bump_versions(instance.movie_id)
+
+
+# the critic's name is rendered inside the nested reviews
+CRITIC_FIELDS = {"first_name", "last_name"}
+
+
+def critic_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields and not CRITIC_FIELDS & set(update_fields):
+        return
+
+    movie_ids = set(
+        Review.objects.filter(critic_id=instance.id).values_list("movie_id", flat=True)
+    )
+
+    if movie_ids:
+        bump_versions(*movie_ids)
@@ -0,0 +1,211 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from movies.benchmark import percentile
+from utils.sqlite_backend.base import apply_pragmas
+
+SCHEMA = """
+CREATE TABLE movies (
+    id integer PRIMARY KEY,
+    title varchar(255) NOT NULL,
+    synopsis varchar(511) NOT NULL,
+    review_count integer NOT NULL,
+    stars_sum integer NOT NULL,
+    average_stars real NULL
+);
+CREATE TABLE reviews (
+    id integer PRIMARY KEY,
+    movie_id integer NOT NULL REFERENCES movies (id),
+    critic_id integer NOT NULL,
+    stars integer NOT NULL,
+    review text NOT NULL,
+    spoilers bool NOT NULL
+);
+CREATE TABLE histograms (
+    movie_id integer PRIMARY KEY REFERENCES movies (id),
+    stars_7 integer NOT NULL,
+    spoilers integer NOT NULL
+);
+CREATE INDEX reviews_movie_id ON reviews (movie_id);
+CREATE INDEX reviews_critic_id ON reviews (critic_id);
+CREATE UNIQUE INDEX reviews_unique_critic_movie ON reviews (critic_id, movie_id);
+"""
+
+READ_SQL = [
+    "SELECT * FROM movies WHERE id = ?",
+    "SELECT * FROM reviews WHERE movie_id = ?",
+]
+
+# what ReviewSerializer.create, update_movie_rating and update_histograms
+# run, in one transaction (the histogram upsert is trimmed to one column);
+# a duplicate review is caught by the unique index, not by a SELECT first
+WRITE_SQL = [
+    "INSERT INTO reviews (movie_id, critic_id, stars, review, spoilers) "
+    "VALUES (?, ?, ?, 'Benchmark review', 0)",
+    "UPDATE movies SET review_count = review_count + 1, stars_sum = stars_sum + ?, "
+    "average_stars = CAST(stars_sum + ? AS REAL) / (review_count + 1) WHERE id = ?",
+    "INSERT INTO histograms (movie_id, stars_7, spoilers) VALUES (?, 1, 0) "
+    "ON CONFLICT (movie_id) DO UPDATE SET stars_7 = histograms.stars_7 + "
+    "excluded.stars_7, spoilers = histograms.spoilers + excluded.spoilers",
+]
+
+
+class Profile:
+    """
+    How a settings.SQLITE_PROFILES entry opens connections and begins
+    transactions, replayed with the sqlite3 module.
+    """
+
+    def __init__(self, name, config):
+        options = config.get("OPTIONS", {})
+
+        self.name = name
+        self.pragmas = options.get("pragmas", {})
+        self.begin = f"BEGIN {options.get('transaction_mode') or ''}".strip()
+        self.timeout = options.get("timeout", 5)
+        self.persistent = config.get("CONN_MAX_AGE", 0) != 0
+
+    def connect(self, path):
+        connection = sqlite3.connect(path, timeout=self.timeout, isolation_level=None)
+        apply_pragmas(connection, self.pragmas)
+
+        return connection
+
+
+class SQLiteConcurrencyBenchmark:
+    """
+    Readers fetching a movie with its reviews against writers adding reviews,
+    on a scratch database file per profile. Reports throughput, p95 latency
+    and how many operations failed with "database is locked".
+    """
+
+    def __init__(self, readers=8, writers=4, seconds=5, movies=1000, seed=0):
+        self.readers = readers
+        self.writers = writers
+        self.seconds = seconds
+        self.movies = movies
+        self.seed = seed
+
+    def create_database(self, path):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO movies VALUES (?, ?, 'Synopsis', 0, 0, NULL)",
+            [(index, f"Movie {index}") for index in range(1, self.movies + 1)],
+        )
+        connection.close()
+
+    def worker(self, profile, path, operation, deadline, seed, stats):
+        rng = random.Random(seed)
+        connection = profile.connect(path) if profile.persistent else None
+
+        while time.perf_counter() < deadline:
+            if not profile.persistent:
+                connection = profile.connect(path)
+
+            start = time.perf_counter()
+
+            try:
+                operation(connection, profile, rng)
+            except sqlite3.OperationalError as error:
+                if "locked" not in str(error):
+                    raise
+
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+
+                stats["locked"] += 1
+            else:
+                stats["durations"].append(time.perf_counter() - start)
+
+            if not profile.persistent:
+                connection.close()
+
+        if profile.persistent:
+            connection.close()
+
+    def read(self, connection, profile, rng):
+        movie_id = rng.randint(1, self.movies)
+
+        for sql in READ_SQL:
+            connection.execute(sql, [movie_id]).fetchall()
+
+    def write(self, connection, profile, rng):
+        movie_id = rng.randint(1, self.movies)
+        critic_id = rng.randint(1, 10**9)
+        stars = rng.randint(1, 10)
+
+        connection.execute(profile.begin)
+        connection.execute(WRITE_SQL[0], [movie_id, critic_id, stars])
+        connection.execute(WRITE_SQL[1], [stars, stars, movie_id])
+        connection.execute(WRITE_SQL[2], [movie_id])
+        connection.execute("COMMIT")
+
+    def run_profile(self, profile):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.sqlite3")
+            self.create_database(path)
+
+            # one stats dict per thread, merged once they are done
+            workers = [
+                ("read", self.read, {"durations": [], "locked": 0})
+                for _ in range(self.readers)
+            ] + [
+                ("write", self.write, {"durations": [], "locked": 0})
+                for _ in range(self.writers)
+            ]
+            deadline = time.perf_counter() + self.seconds
+            threads = [
+                threading.Thread(
+                    target=self.worker,
+                    args=(profile, path, operation, deadline, seed, stats),
+                )
+                for seed, (_, operation, stats) in enumerate(workers, start=self.seed)
+            ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        results = {}
+
+        for kind in ("read", "write"):
+            durations = [
+                duration
+                for name, _, stats in workers
+                if name == kind
+                for duration in stats["durations"]
+            ]
+            results[kind] = {
+                "per_second": round(len(durations) / self.seconds, 1),
+                "p95_ms": round(percentile(durations or [0], 0.95) * 1000, 3),
+                "locked": sum(
+                    stats["locked"] for name, _, stats in workers if name == kind
+                ),
+            }
+
+        return results
+
+    def run(self, profiles=None):
+        profiles = profiles or list(settings.SQLITE_PROFILES)
+
+        return {
+            "settings": {
+                "readers": self.readers,
+                "writers": self.writers,
+                "seconds": self.seconds,
+                "movies": self.movies,
+            },
+            "results": {
+                name: self.run_profile(Profile(name, settings.SQLITE_PROFILES[name]))
+                for name in profiles
+            },
+        }
@@ -0,0 +1,55 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "movies:version"
+MOVIE_VERSION_KEY = "movies:version:{}"
+
+
+def _get_version(key):
+    # A fresh counter starts from the clock, so a key that was evicted never
+    # comes back with a value that older cached responses were stored under.
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def get_movie_version(movie_id):
+    return _get_version(MOVIE_VERSION_KEY.format(movie_id))
+
+
+def _bump(movie_ids):
+    _incr_version(CATALOG_VERSION_KEY)
+
+    for movie_id in movie_ids:
+        _incr_version(MOVIE_VERSION_KEY.format(movie_id))
+
+
+def bump_versions(*movie_ids):
+    """
+    Invalidate everything derived from the catalog and from the given movies.
+
+    Bumped right away and again on commit: a response computed in between
+    could read the old rows under the new version, and the second bump
+    makes sure it is never served.
+    """
+    movie_ids = [movie_id for movie_id in movie_ids if movie_id is not None]
+
+    _bump(movie_ids)
+    transaction.on_commit(lambda: _bump(movie_ids))
@@ -1,50 +1,311 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.generics import get_object_or_404 as get_row_or_404
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
-from utils.mixins import CreateUpdateViewSet
-from utils.permissions import IsCriticoUser, IsSuperUserOrReadOnly
+from utils.authentication import CachedTokenAuthentication
+from utils.mixins import (
+    AnonymousResponseCacheMixin,
+    ConditionalGetMixin,
+    CreateUpdateViewSet,
+    ReplicaReadMixin,
+    SparseFieldsMixin,
+)
+from utils.pagination import KeysetPagination
+from utils.permissions import IsCriticoUser, IsSuperUser, IsSuperUserOrReadOnly
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework import status
 
-from movies.models import Movies, Review
+from movies.bulk_reviews import submit_reviews
+from movies.exporter import spool_catalog
+from movies.fastpath import MOVIE_COLUMNS, movie_rows, serialize_movies
+from movies.filters import MovieFilter
+from movies.histograms import COUNT_COLUMNS, get_movie_stats
+from movies.importer import get_reader, import_movies
+from movies.models import Movies, Review, StarHistogram
+from movies.nested_reviews import get_review_ordering, top_reviews
+from movies.pagination import MoviePagination, ReviewPagination
+from movies.review_update import update_review
+from movies.search import search_movies, supports_search_index
 from movies.serializers import (
     MovieSerializer,
     MovieWithReviewSerializer,
     ReviewSerializer,
+    ReviewUpdateSerializer,
 )
+from movies.versions import get_catalog_version, get_movie_version
 
 
 class SearchForTitle(filters.SearchFilter):
     search_param = "title"
 
+    def filter_queryset(self, request, queryset, view):
+        if not supports_search_index(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+
+        return search_movies(queryset, request.query_params.get(self.search_param, ""))
 
-class MovieView(ModelViewSet):
+
+class MovieView(
+    AnonymousResponseCacheMixin,
+    ConditionalGetMixin,
+    ReplicaReadMixin,
+    SparseFieldsMixin,
+    ModelViewSet,
+):
     queryset = Movies.objects.all()
     serializer_class = MovieSerializer
 
-    filter_backends = [SearchForTitle]
+    filter_backends = [SearchForTitle, DjangoFilterBackend]
     search_fields = ["title"]
+    filterset_class = MovieFilter
+
+    pagination_class = MoviePagination
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsSuperUserOrReadOnly]
 
+    cache_key_prefix = "movies"
+    cached_actions = ("list", "retrieve", "stats")
+    etag_actions = ("list", "retrieve", "stats")
+
+    import_batch_size = 1000
+    export_chunk_size = 500
+
+    def get_cache_version(self, action, **kwargs):
+        if action == "list":
+            return get_catalog_version()
+
+        try:
+            return get_movie_version(int(kwargs["pk"]))
+        except ValueError:
+            return None
+
     def get_serializer_class(self):
         user = self.request.user
 
-        if not user.is_anonymous and self.request.method != "POST":
+        if not user.is_anonymous and self.request.method in SAFE_METHODS:
             return MovieWithReviewSerializer
 
         return super().get_serializer_class()
 
-    def get_object(self):
-        user = self.request.user
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if self.action in ("list", "retrieve"):
+            fields = self.get_sparse_fields()
+
+            if fields is None or "genres" in fields:
+                queryset = queryset.prefetch_related("genres")
+
+            if fields is not None:
+                queryset = queryset.only(*self.get_movie_columns())
+
+        return queryset
+
+    def get_movie_columns(self):
+        fields = self.get_sparse_fields()
+
+        if fields is None:
+            return MOVIE_COLUMNS
+
+        # the keyset columns and the count behind reviews_next are always read
+        required = {
+            column
+            for columns in MoviePagination.orderings.values()
+            for column in columns
+        }
+
+        if self.nests_reviews():
+            required.add("review_count")
+
+        return [
+            column for column in MOVIE_COLUMNS if column in fields or column in required
+        ]
+
+    def get_reviews_ordering(self):
+        return get_review_ordering(self.request.query_params.get("reviews_ordering"))
+
+    def nests_reviews(self):
+        fields = self.get_sparse_fields()
+
+        return self.get_serializer_class() is MovieWithReviewSerializer and (
+            fields is None or "reviews" in fields
+        )
+
+    def prefetch_reviews(self, movies):
+        if not movies or not self.nests_reviews():
+            return
+
+        reviews = top_reviews(
+            [movie.id for movie in movies],
+            self.get_reviews_ordering(),
+            settings.MOVIE_REVIEWS_LIMIT,
+        )
+        prefetch_related_objects(
+            movies, Prefetch("reviews", queryset=reviews.select_related("critic"))
+        )
+
+    def add_reviews_next(self, movies, review_counts):
+        # link to the reviews that did not fit in the nested list, or None
+        if not self.nests_reviews():
+            return movies
+
+        ordering = self.get_reviews_ordering()
+        pagination = ReviewPagination()
+
+        for movie, review_count in zip(movies, review_counts):
+            reviews = movie["reviews"]
+            movie["reviews_next"] = None
+
+            if reviews and review_count > len(reviews):
+                url = reverse(
+                    "movies-reviews", kwargs={"pk": movie["id"]}, request=self.request
+                )
+                movie["reviews_next"] = pagination.get_link_after(
+                    url, ordering, reviews[-1]
+                )
+
+        return movies
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.get_not_modified_response(request)
+
+        if not_modified is not None:
+            return not_modified
 
-        if self.action == "review":
-            return Review.objects.filter(critic_id=user.id, movie_id=self.kwargs["pk"])
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if not settings.MOVIES_FAST_READ_PATH:
+            page = self.paginate_queryset(queryset)
+            self.prefetch_reviews(page)
+            data = self.get_serializer(page, many=True).data
+            review_counts = [movie.review_count for movie in page]
+        else:
+            page = self.paginate_queryset(
+                movie_rows(queryset, self.get_movie_columns())
+            )
+            data = serialize_movies(
+                page,
+                self.get_serializer_class(),
+                self.get_reviews_ordering(),
+                self.get_sparse_fields(),
+            )
+            review_counts = [row.get("review_count") for row in page]
+
+        return self.get_paginated_response(self.add_reviews_next(data, review_counts))
+
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.get_not_modified_response(request)
+
+        if not_modified is not None:
+            return not_modified
+
+        if not settings.MOVIES_FAST_READ_PATH:
+            movie = self.get_object()
+            self.prefetch_reviews([movie])
+            data = self.get_serializer(movie).data
+            review_count = movie.review_count
+        else:
+            queryset = movie_rows(
+                self.filter_queryset(self.get_queryset()), self.get_movie_columns()
+            )
+            row = get_row_or_404(queryset, pk=kwargs[self.lookup_field])
+            data = serialize_movies(
+                [row],
+                self.get_serializer_class(),
+                self.get_reviews_ordering(),
+                self.get_sparse_fields(),
+            )[0]
+            review_count = row.get("review_count")
+
+        return Response(self.add_reviews_next([data], [review_count])[0])
 
-        return super().get_object()
+    @action(
+        methods=["get"],
+        detail=True,
+        permission_classes=[IsAuthenticated],
+        pagination_class=ReviewPagination,
+    )
+    def reviews(self, request, *args, **kwargs):
+        try:
+            movie_id = int(kwargs["pk"])
+        except ValueError:
+            raise Http404
+
+        queryset = Review.objects.select_related("critic").filter(movie_id=movie_id)
+        page = self.paginate_queryset(queryset)
+
+        # the movie is only looked up when it has no reviews to show
+        if not page and not Movies.objects.filter(id=movie_id).exists():
+            raise Http404
+
+        serializer = ReviewSerializer(page, many=True)
+
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=["get"], detail=True)
+    def stats(self, request, *args, **kwargs):
+        not_modified = self.get_not_modified_response(request)
+
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            movie_id = int(kwargs["pk"])
+        except ValueError:
+            raise Http404
+
+        counts = (
+            StarHistogram.objects.filter(movie_id=movie_id)
+            .values(*COUNT_COLUMNS)
+            .first()
+        )
+
+        # movies without reviews have no histogram row yet
+        if counts is None and not Movies.objects.filter(id=movie_id).exists():
+            raise Http404
+
+        return Response(get_movie_stats(counts))
+
+    @action(methods=["get"], detail=False, permission_classes=[IsSuperUser])
+    def export(self, request, *args, **kwargs):
+        # spooled in the view: Django 3.2 iterates streaming responses on the
+        # ASGI event loop, where the ORM refuses to run
+        response = FileResponse(
+            spool_catalog(self.export_chunk_size),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = 'attachment; filename="movies.ndjson"'
+
+        return response
+
+    @action(methods=["post"], detail=False, url_path="import")
+    def import_movies(self, request, *args, **kwargs):
+        # reads the raw body line by line, request.data would buffer it whole
+        reader = get_reader(request.content_type)
+
+        if reader is None:
+            return Response(
+                {"detail": "Send the movies as application/x-ndjson or text/csv."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+
+        created, errors = import_movies(
+            reader(request.stream or []), self.import_batch_size
+        )
+
+        return Response(
+            {"created": created, "errors": errors}, status=status.HTTP_200_OK
+        )
 
     @action(
         methods=["post", "put"],
@@ -53,51 +314,81 @@ class MovieView(ModelViewSet):
         serializer_class=ReviewSerializer,
     )
     def review(self, request, *args, **kwargs):
-        movie = get_object_or_404(Movies, id=kwargs["pk"])
-
         if request.method == "POST":
+            movie = get_object_or_404(Movies, id=kwargs["pk"])
             request.data["movie"] = movie.id
 
             return super().create(request, *args, **kwargs)
 
         else:
-            review = self.get_object()
-            request.data["critic"] = self.request.user
-
-            review.update(**request.data)
-
-            try:
-                serializer = ReviewSerializer(review[0])
+            serializer = ReviewUpdateSerializer(data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
 
-                return Response(serializer.data, status=status.HTTP_200_OK)
+            review = update_review(
+                request.user, kwargs["pk"], serializer.validated_data
+            )
+            serializer = ReviewSerializer(review)
 
-            except IndexError:
-                return Response(
-                    {"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND
-                )
+            return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ReviewView(mixins.ListModelMixin, GenericViewSet):
-    queryset = Review.objects.all()
+class ReviewView(
+    ReplicaReadMixin, SparseFieldsMixin, mixins.ListModelMixin, GenericViewSet
+):
+    queryset = Review.objects.select_related("critic")
     serializer_class = ReviewSerializer
 
-    authentication_classes = [TokenAuthentication]
+    pagination_class = KeysetPagination
+
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsCriticoUser]
 
+    max_bulk_reviews = 500
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+
+        if fields is None:
+            return queryset
+
+        if "critic" not in fields:
+            queryset = queryset.select_related(None)
+
+        # every review field is a column; the primary key is always loaded
+        return queryset.only(*fields)
+
     def filter_queryset(self, queryset):
-        if self.request.user.is_superuser:
-            queryset = Review.objects.all()
-        else:
+        if not self.request.user.is_superuser:
             queryset = queryset.filter(critic_id=self.request.user.id)
 
         return super().filter_queryset(queryset)
 
+    @action(methods=["post"], detail=False)
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+
+        if not isinstance(items, list):
+            raise ValidationError({"detail": "Expected a list of reviews."})
+
+        if len(items) > self.max_bulk_reviews:
+            raise ValidationError(
+                {"detail": f"Send at most {self.max_bulk_reviews} reviews at once."}
+            )
+
+        results = submit_reviews(request.user, items)
+        created = sum(result.get("status") == "created" for result in results)
+
+        return Response(
+            {"created": created, "results": results}, status=status.HTTP_200_OK
+        )
+
 
 class MovieReviewView(CreateUpdateViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsCriticoUser]
 
     def create(self, request, *args, **kwargs):
@@ -1,6 +1,56 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import warnings
+from base64 import urlsafe_b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import StreamingHttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from kmdb.asgi import application as asgi_application
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APITestCase
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from accounts import urls as accounts_urls
+from movies import urls as movies_urls
+from movies.benchmark import BenchmarkRunner, compare
+from movies.bulk_reviews import reviewed_movies
+from movies.durations import parse_minutes
+from movies.exporter import export_catalog
+from movies.models import Genres, Movies, Review, StarHistogram
+from movies.sqlite_benchmark import SQLiteConcurrencyBenchmark
+from movies.versions import bump_versions
+from movies.views import ReviewView
+from utils.authentication import CachedTokenAuthentication
+from utils.coalescing import SingleFlightMiddleware
+from utils.metrics import registry as metrics_registry
+from utils.middleware import MetricsMiddleware
+from utils.renderers import FastJSONRenderer
+from utils.routers import ReplicaRouter
+from utils.sqlite_backend.base import DatabaseWrapper as SQLiteProfileWrapper
 
 
 class TestMovieView(TestCase):
@@ -228,6 +278,8 @@ class TestMovieView(TestCase):
             "premiere": "1972-09-10",
             "classification": 14,
             "synopsis": "Don Vito Corleone (Marlon Brando) é o chefe de uma 'família' de Nova York que está feliz, pois Connie (Talia Shire), sua filha,se casou com Carlo (Gianni Russo). Por ser seu padrinho Vito foi procurar o líder da banda e ofereceu 10 mil dólares para deixar Johnny sair, mas teve o pedido recusado.",
+            "review_count": 0,
+            "average_stars": None,
         }
 
         self.assertEqual(movie_1, output_format_movie_data)
@@ -1476,3 +1528,2034 @@ class TestListReview(APITestCase):
         critic_2 = {"first_name": "Clark", "last_name": "Kent"}
 
         self.assertDictContainsSubset(critic_2, response.json()[1]["critic"])
+
+
+class TestMovieQueryBudget(APITestCase):
+    # maximo de queries por endpoint, independente do numero de filmes
+    query_budgets = {
+        "anonymous_list": 2,
+        "anonymous_retrieve": 2,
+        "authenticated_list": 4,
+        "authenticated_retrieve": 4,
+        "admin_reviews": 2,
+    }
+
+    def setUp(self):
+        User = get_user_model()
+
+        self.admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        self.admin_token = Token.objects.create(user=self.admin)
+
+        drama = Genres.objects.create(name="Drama")
+        crime = Genres.objects.create(name="Crime")
+
+        for index in range(10):
+            critic = User.objects.create_user(
+                username=f"critic{index}", password="1234", is_staff=True
+            )
+            movie = Movies.objects.create(
+                title=f"Filme {index}",
+                duration=120,
+                premiere="2021-01-01",
+                classification=14,
+                synopsis="Sinopse",
+            )
+            movie.genres.add(drama, crime)
+            Review.objects.create(
+                movie=movie, critic=critic, stars=5, review="Ok", spoilers=False
+            )
+
+    def test_anonymous_list_query_budget(self):
+        with self.assertNumQueries(self.query_budgets["anonymous_list"]):
+            response = self.client.get("/api/movies/")
+
+        self.assertEqual(len(response.json()), 10)
+
+    def test_anonymous_retrieve_query_budget(self):
+        with self.assertNumQueries(self.query_budgets["anonymous_retrieve"]):
+            response = self.client.get("/api/movies/1/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_authenticated_list_query_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        with self.assertNumQueries(self.query_budgets["authenticated_list"]):
+            response = self.client.get("/api/movies/")
+
+        self.assertEqual(len(response.json()[0]["reviews"]), 1)
+
+    def test_authenticated_retrieve_query_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        with self.assertNumQueries(self.query_budgets["authenticated_retrieve"]):
+            response = self.client.get("/api/movies/1/")
+
+        self.assertIn("reviews", response.json())
+
+    def test_admin_reviews_query_budget(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.admin_token.key)
+
+        with self.assertNumQueries(self.query_budgets["admin_reviews"]):
+            response = self.client.get("/api/reviews/")
+
+        self.assertEqual(len(response.json()), 10)
+
+
+class TestKeysetPagination(APITestCase):
+    def setUp(self):
+        for index in range(7):
+            Movies.objects.create(
+                title=f"Filme {index}",
+                duration=120,
+                premiere=f"20{index % 3:02d}-01-01",
+                classification=14,
+                synopsis="Sinopse",
+            )
+
+    def follow_pages(self, url):
+        ids = []
+
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+
+            self.assertEqual(response.status_code, 200)
+            ids += [movie["id"] for movie in response.json()]
+
+            link = response.get("Link")
+            url = link[1 : link.index(">")] if link else None
+
+        return ids
+
+    def test_pages_by_id(self):
+        ids = self.follow_pages("/api/movies/?page_size=3")
+
+        self.assertEqual(ids, [1, 2, 3, 4, 5, 6, 7])
+
+    def test_pages_by_premiere(self):
+        ids = self.follow_pages("/api/movies/?page_size=2&ordering=premiere")
+
+        self.assertEqual(ids, [1, 4, 7, 2, 5, 3, 6])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/movies/?cursor=invalid")
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_invalid_values(self):
+        positions = [
+            ("id", ["abc"]),
+            ("id", [{"a": 1}]),
+            ("premiere", ["nope", 1]),
+            ("premiere", [None, 1]),
+            ("premiere", ["2021-01-01", [1]]),
+        ]
+
+        for ordering, position in positions:
+            payload = json.dumps({"o": ordering, "p": position}).encode()
+            cursor = urlsafe_b64encode(payload).decode().rstrip("=")
+            response = self.client.get(
+                "/api/movies/", {"ordering": ordering, "cursor": cursor}
+            )
+
+            self.assertEqual(response.status_code, 404, position)
+            self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+
+class TestMovieFullTextSearch(APITestCase):
+    def setUp(self):
+        self.drama = Genres.objects.create(name="Drama")
+
+        self.movie_1 = Movies.objects.create(
+            title="Em busca de liberdade",
+            duration=120,
+            premiere="2018-02-22",
+            classification=14,
+            synopsis="Um corredor olímpico vai para a China",
+        )
+        self.movie_2 = Movies.objects.create(
+            title="Um Sonho",
+            duration=142,
+            premiere="1994-10-14",
+            classification=14,
+            synopsis="Andy sonha com a liberdade",
+        )
+        self.movie_2.genres.add(self.drama)
+
+    def search(self, value):
+        response = self.client.get("/api/movies/", {"title": value})
+        self.assertEqual(response.status_code, 200)
+
+        return [movie["id"] for movie in response.json()]
+
+    def test_title_matches_rank_above_synopsis_matches(self):
+        self.assertEqual(self.search("liberdade"), [1, 2])
+
+    def test_search_ignores_accents_and_matches_prefixes(self):
+        self.assertEqual(self.search("olimpico"), [1])
+        self.assertEqual(self.search("liberd"), [1, 2])
+
+    def test_search_by_genre_name(self):
+        self.assertEqual(self.search("drama"), [2])
+
+        self.drama.name = "Suspense"
+        self.drama.save()
+        self.assertEqual(self.search("suspense"), [2])
+
+        self.movie_2.genres.remove(self.drama)
+        self.assertEqual(self.search("suspense"), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.movie_1.title = "Carruagens de fogo"
+        self.movie_1.save()
+        self.assertEqual(self.search("carruagens"), [1])
+
+        self.movie_1.delete()
+        self.assertEqual(self.search("carruagens"), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('liberdade" OR "sonho'), [])
+        self.assertEqual(self.search("*"), [1, 2])
+
+    def test_search_results_are_paginated(self):
+        response = self.client.get(
+            "/api/movies/", {"title": "liberdade", "page_size": 1}
+        )
+        self.assertEqual([movie["id"] for movie in response.json()], [1])
+
+        link = response["Link"]
+        response = self.client.get(link[1 : link.index(">")])
+        self.assertEqual([movie["id"] for movie in response.json()], [2])
+        self.assertNotIn("Link", response)
+
+
+class TestMovieRatingAggregates(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.movie = Movies.objects.create(
+            title="Nomadland",
+            duration=110,
+            premiere="2021-04-15",
+            classification=14,
+            synopsis="Sinopse",
+        )
+        self.critics = [
+            User.objects.create_user(
+                username=f"critic{index}", password="1234", is_staff=True
+            )
+            for index in range(2)
+        ]
+
+    def assertRating(self, review_count, average_stars):
+        movie = self.client.get(f"/api/movies/{self.movie.id}/").json()
+
+        self.assertEqual(movie["review_count"], review_count)
+        self.assertEqual(movie["average_stars"], average_stars)
+        self.assertNotIn("stars_sum", movie)
+
+    def authenticate(self, critic):
+        token = Token.objects.get_or_create(user=critic)[0]
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+    def test_aggregates_follow_review_writes(self):
+        url = f"/api/movies/{self.movie.id}/review/"
+        review = {"stars": 8, "review": "Bom", "spoilers": False}
+
+        self.authenticate(self.critics[0])
+        self.client.post(url, review, format="json")
+        self.assertRating(1, 8.0)
+
+        self.authenticate(self.critics[1])
+        self.client.post(url, {**review, "stars": 5}, format="json")
+        self.assertRating(2, 6.5)
+
+        # duplicated reviews do not count
+        self.client.post(url, review, format="json")
+        self.assertRating(2, 6.5)
+
+        self.client.put(url, {**review, "stars": 3}, format="json")
+        self.assertRating(2, 5.5)
+
+        Review.objects.get(critic=self.critics[0]).delete()
+        self.assertRating(1, 3.0)
+
+        Review.objects.get(critic=self.critics[1]).delete()
+        self.assertRating(0, None)
+
+
+class TestGenreResolution(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        token = Token.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        self.movie_data = {
+            "title": "Nomadland",
+            "duration": "110m",
+            "premiere": "2021-04-15",
+            "classification": 14,
+            "synopsis": "Sinopse",
+        }
+
+    def test_genres_are_reused_case_insensitively(self):
+        Genres.objects.create(name="Drama")
+
+        response = self.client.post(
+            "/api/movies/",
+            {
+                **self.movie_data,
+                "genres": [{"name": "DRAMA"}, {"name": "Road"}, {"name": "road"}],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()["genres"],
+            [{"id": 1, "name": "Drama"}, {"id": 2, "name": "Road"}],
+        )
+        self.assertEqual(Genres.objects.count(), 2)
+
+    def test_update_links_new_genres_once(self):
+        movie = self.client.post(
+            "/api/movies/",
+            {**self.movie_data, "genres": [{"name": "Drama"}]},
+            format="json",
+        ).json()
+
+        response = self.client.put(
+            f"/api/movies/{movie['id']}/",
+            {**self.movie_data, "genres": [{"name": "drama"}, {"name": "Road"}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [genre["name"] for genre in response.json()["genres"]], ["Drama", "Road"]
+        )
+
+    def test_genre_creation_cost_does_not_grow_with_genres(self):
+        genres = [{"name": f"Genre {index}"} for index in range(20)]
+
+        # auth, savepoint, movie insert, genre select, genre insert,
+        # genre re-select, link insert, release, response genres
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                "/api/movies/", {**self.movie_data, "genres": genres}, format="json"
+            )
+
+        self.assertEqual(len(response.json()["genres"]), 20)
+
+
+class TestAnonymousResponseCache(APITestCase):
+    def setUp(self):
+        self.movie = Movies.objects.create(
+            title="Nomadland",
+            duration=110,
+            premiere="2021-04-15",
+            classification=14,
+            synopsis="Sinopse",
+        )
+
+    def test_cache_hit_does_not_touch_the_database(self):
+        first = self.client.get("/api/movies/1/")
+
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/movies/1/")
+
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second["Content-Type"], "application/json")
+
+    def test_writes_invalidate_list_and_detail(self):
+        self.client.get("/api/movies/")
+        self.client.get("/api/movies/1/")
+
+        self.movie.title = "Nomadland 2"
+        self.movie.save()
+
+        self.assertEqual(
+            self.client.get("/api/movies/1/").json()["title"], "Nomadland 2"
+        )
+        self.assertEqual(
+            self.client.get("/api/movies/").json()[0]["title"], "Nomadland 2"
+        )
+
+        self.movie.genres.add(Genres.objects.create(name="Drama"))
+
+        self.assertEqual(len(self.client.get("/api/movies/1/").json()["genres"]), 1)
+
+    def test_other_movies_stay_cached(self):
+        self.client.get("/api/movies/1/")
+
+        Movies.objects.create(
+            title="Outro",
+            duration=90,
+            premiere="2020-01-01",
+            classification=10,
+            synopsis="Sinopse",
+        )
+
+        with self.assertNumQueries(0):
+            self.client.get("/api/movies/1/")
+
+    def test_keys_are_valid_for_memcached(self):
+        path = "/api/movies/?title=" + "a" * 300
+        accept = "application/json; q=0.9"
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.client.get(path, HTTP_ACCEPT=accept)
+
+            with self.assertNumQueries(0):
+                self.client.get(path, HTTP_ACCEPT=accept)
+
+        self.assertEqual(
+            [w for w in caught if issubclass(w.category, CacheKeyWarning)], []
+        )
+
+    def test_authenticated_requests_are_not_cached(self):
+        User = get_user_model()
+        user = User.objects.create_user(username="user", password="1234")
+        token = Token.objects.create(user=user)
+
+        self.client.get("/api/movies/1/")
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        self.assertIn("reviews", self.client.get("/api/movies/1/").json())
+
+
+class TestCachedTokenAuthentication(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        self.token = Token.objects.create(user=self.critic)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_token_lookup_is_cached(self):
+        self.client.get("/api/reviews/")
+
+        # only the reviews query, no token lookup
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/reviews/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_every_request_gets_its_own_user(self):
+        authentication = CachedTokenAuthentication()
+        first, _ = authentication.authenticate_credentials(self.token.key)
+        first.first_name = "Mudado"
+
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(self.token.key)
+
+            self.assertIsNot(user, first)
+            self.assertEqual(user.first_name, "")
+            self.assertIs(token.user, user)
+
+        self.assertEqual(user.pk, self.critic.pk)
+        self.assertFalse(user._state.adding)
+
+    def test_deleted_token_is_revoked(self):
+        self.client.get("/api/reviews/")
+        self.token.delete()
+
+        self.assertEqual(self.client.get("/api/reviews/").status_code, 401)
+
+    def test_permission_changes_apply_immediately(self):
+        self.assertEqual(self.client.get("/api/reviews/").status_code, 200)
+
+        self.critic.is_staff = False
+        self.critic.save()
+        self.assertEqual(self.client.get("/api/reviews/").status_code, 403)
+
+        self.critic.is_active = False
+        self.critic.save()
+        self.assertEqual(self.client.get("/api/reviews/").status_code, 401)
+
+
+class TestMovieImport(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        self.token = Token.objects.create(user=admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def import_movies(self, body, content_type):
+        return self.client.generic(
+            "POST", "/api/movies/import/", body.encode(), content_type=content_type
+        )
+
+    def test_import_ndjson(self):
+        body = "\n".join(
+            [
+                '{"title": "A", "duration": "90m", "premiere": "2020-01-01", "classification": 10, "synopsis": "S", "genres": [{"name": "Drama"}, {"name": "Crime"}]}',
+                "",
+                "{not json",
+                '{"title": "B", "duration": "95m", "premiere": "2020-02-01", "classification": 12, "synopsis": "S", "genres": [{"name": "drama"}]}',
+                '{"title": "C", "genres": []}',
+            ]
+        )
+
+        response = self.import_movies(body, "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["created"], 2)
+        self.assertEqual([error["line"] for error in response.json()["errors"]], [3, 5])
+        self.assertIn("duration", response.json()["errors"][1]["errors"])
+
+        self.assertEqual(Genres.objects.count(), 2)
+        self.assertEqual(
+            list(Movies.objects.get(title="B").genres.values_list("name", flat=True)),
+            ["Drama"],
+        )
+
+    def test_import_csv(self):
+        body = (
+            "title,duration,premiere,classification,synopsis,genres\n"
+            'A,90m,2020-01-01,10,"Uma sinopse\nem duas linhas",Drama|Crime\n'
+            "B,95m,2020-02-01,doze,S,Drama\n"
+        )
+
+        response = self.import_movies(body, "text/csv")
+
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(response.json()["errors"][0]["line"], 4)
+        self.assertEqual(Movies.objects.get().synopsis, "Uma sinopse\nem duas linhas")
+        self.assertEqual(Movies.objects.get().genres.count(), 2)
+
+    def test_imported_movies_are_searchable(self):
+        self.import_movies(
+            '{"title": "Nomadland", "duration": "110m", "premiere": "2021-04-15", "classification": 14, "synopsis": "S", "genres": [{"name": "Road"}]}',
+            "application/x-ndjson",
+        )
+
+        response = self.client.get("/api/movies/", {"title": "road"})
+        self.assertEqual(len(response.json()), 1)
+
+    def test_only_admin_can_import(self):
+        User = get_user_model()
+        critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        token = Token.objects.create(user=critic)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        response = self.import_movies("{}", "application/x-ndjson")
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_unsupported_content_type(self):
+        response = self.import_movies("[]", "application/json")
+
+        self.assertEqual(response.status_code, 415)
+
+
+class TestCatalogExport(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        drama = Genres.objects.create(name="Drama")
+
+        for index in range(5):
+            movie = Movies.objects.create(
+                title=f"Filme {index}",
+                duration=120,
+                premiere="2021-01-01",
+                classification=14,
+                synopsis="Sinopse",
+            )
+            movie.genres.add(drama)
+            Review.objects.create(
+                movie=movie, critic=critic, stars=5, review="Ok", spoilers=False
+            )
+
+    def test_export_streams_one_movie_per_line(self):
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        response = self.client.get("/api/movies/export/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        movies = [json.loads(line) for line in lines]
+
+        self.assertEqual([movie["id"] for movie in movies], [1, 2, 3, 4, 5])
+        self.assertEqual(movies[0]["genres"], [{"id": 1, "name": "Drama"}])
+        self.assertEqual(movies[0]["reviews"][0]["critic"]["first_name"], "")
+
+    def test_export_queries_per_chunk(self):
+        # 3 chunks of 2 movies + the empty one that ends the export
+        with self.assertNumQueries(3 * 3 + 1):
+            chunks = list(export_catalog(chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+
+    def test_only_admin_can_export(self):
+        self.assertEqual(self.client.get("/api/movies/export/").status_code, 401)
+
+    def test_export_command(self):
+        output = StringIO()
+
+        call_command("export_catalog", chunk_size=2, stdout=output)
+
+        self.assertEqual(len(output.getvalue().splitlines()), 5)
+
+
+class TestCatalogExportASGI(TransactionTestCase):
+    setUp = TestCatalogExport.setUp
+
+    def test_export_is_complete_under_asgi(self):
+        token = Token.objects.create(user=self.admin)
+        scope, receive, send, sent = TestSingleFlight.request(
+            self,
+            "/api/movies/export/",
+            [(b"authorization", f"Token {token.key}".encode())],
+        )
+
+        asyncio.run(asgi_application(scope, receive, send))
+        asyncio.run(sync_to_async(connections.close_all)())
+
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertEqual(len(body.decode().splitlines()), 5)
+
+
+class TestMetrics(APITestCase):
+    def setUp(self):
+        metrics_registry.reset()
+
+        User = get_user_model()
+        admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        self.token = Token.objects.create(user=admin)
+
+    def test_metrics_are_recorded_per_view_and_action(self):
+        self.client.get("/api/movies/")
+        self.client.get("/api/movies/99/")
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        response = self.client.get("/api/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+        metrics = response.content.decode()
+        self.assertIn("# TYPE kmdb_request_duration_seconds histogram", metrics)
+        self.assertIn(
+            'kmdb_request_duration_seconds_count{view="MovieView",action="list"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'kmdb_requests_total{view="MovieView",action="retrieve",status="4xx"} 1',
+            metrics,
+        )
+        self.assertIn(
+            'kmdb_db_queries_bucket{view="MovieView",action="retrieve",le="1"} 1',
+            metrics,
+        )
+
+    def test_only_admin_can_read_metrics(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+
+    def test_streaming_responses_are_measured_to_the_last_chunk(self):
+        def rows():
+            for title in ["Um", "Dois"]:
+                time.sleep(0.03)
+                yield str(Movies.objects.filter(title=title).count()).encode()
+
+        middleware = MetricsMiddleware(lambda request: StreamingHttpResponse(rows()))
+        response = middleware(RequestFactory().get("/stream/"))
+
+        self.assertEqual(metrics_registry.render().count("_count{"), 0)
+        self.assertEqual(b"".join(response.streaming_content), b"00")
+
+        metrics = metrics_registry.render()
+        self.assertIn(
+            'kmdb_db_queries_bucket{view="unmatched",action="get",le="1"} 0', metrics
+        )
+        self.assertIn(
+            'kmdb_db_queries_bucket{view="unmatched",action="get",le="2"} 1', metrics
+        )
+        self.assertIn(
+            'kmdb_response_size_bytes_sum{view="unmatched",action="get"} 2', metrics
+        )
+
+        duration = metrics.split(
+            'kmdb_request_duration_seconds_sum{view="unmatched",action="get"} '
+        )[1]
+        self.assertGreaterEqual(float(duration.split()[0]), 0.06)
+
+
+class TestSeedAndBenchmark(TestCase):
+    def test_seed_is_deterministic(self):
+        call_command("seed_catalog", movies=3, critics=4, reviews_per_movie=2)
+        first = list(Movies.objects.values_list("premiere", "stars_sum"))
+
+        Review.objects.all().delete()
+        Movies.objects.all().delete()
+        call_command("seed_catalog", movies=3, critics=4, reviews_per_movie=2)
+
+        self.assertEqual(
+            list(Movies.objects.values_list("premiere", "stars_sum")), first
+        )
+        self.assertEqual(Review.objects.count(), 6)
+        self.assertEqual(Movies.objects.first().genres.count(), 2)
+
+    def test_benchmark_covers_every_route_and_rolls_back(self):
+        runner = BenchmarkRunner(iterations=1, movies=3, critics=2)
+        report = runner.run()
+
+        self.assertEqual(Movies.objects.count(), 0)
+
+        routes = set()
+
+        for pattern in accounts_urls.urlpatterns + movies_urls.urlpatterns:
+            view = pattern.callback
+            methods = getattr(view, "actions", None) or {
+                method: method
+                for method in view.cls.http_method_names
+                if hasattr(view.cls, method)
+            }
+            routes |= {
+                (view, method)
+                for method in methods
+                if method not in ("head", "options")
+            }
+
+        timed = {
+            (resolve(path(0).split("?")[0]).func, method)
+            for name, method, _, path, _, _ in runner.get_cases()
+        }
+        self.assertEqual(routes - timed, set())
+        self.assertIn("movies-review-update", report["results"])
+        self.assertIn("render-movies-stdlib", report["results"])
+        self.assertEqual(report["results"]["movies-retrieve-anonymous"]["queries"], 2)
+
+    def test_compare_flags_slower_routes_and_extra_queries(self):
+        previous = {"results": {"movies": {"p95_ms": 10, "queries": 2}}}
+        current = {"results": {"movies": {"p95_ms": 13, "queries": 3}}}
+
+        self.assertEqual(len(compare(previous, current, threshold=0.2)), 2)
+        self.assertEqual(
+            compare(previous, current, threshold=0.5)[0][:16], "movies: queries "
+        )
+
+
+class TestMoviePremiereDurationFilters(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        admin = User.objects.create_user(
+            username="admin", password="1234", is_staff=True, is_superuser=True
+        )
+        self.token = Token.objects.create(user=admin)
+
+        for title, duration, premiere in [
+            ("Curto", 90, "2000-05-01"),
+            ("Médio", 120, "2010-05-01"),
+            ("Longo", 175, "2020-05-01"),
+        ]:
+            Movies.objects.create(
+                title=title,
+                duration=duration,
+                premiere=premiere,
+                classification=14,
+                synopsis="Sinopse",
+            )
+
+    def titles(self, **params):
+        response = self.client.get("/api/movies/", params)
+        self.assertEqual(response.status_code, 200)
+
+        return [movie["title"] for movie in response.json()]
+
+    def test_filter_by_premiere_range(self):
+        self.assertEqual(self.titles(premiere_after="2010-01-01"), ["Médio", "Longo"])
+        self.assertEqual(self.titles(premiere_before="2010-05-01"), ["Curto", "Médio"])
+        self.assertEqual(
+            self.titles(premiere_after="2005-01-01", premiere_before="2015-01-01"),
+            ["Médio"],
+        )
+
+    def test_filter_by_max_duration(self):
+        self.assertEqual(self.titles(max_duration=120), ["Curto", "Médio"])
+        self.assertEqual(
+            self.titles(max_duration=150, premiere_after="2005-01-01"), ["Médio"]
+        )
+
+    def test_invalid_filter_value(self):
+        response = self.client.get("/api/movies/", {"premiere_after": "ontem"})
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_duration_keeps_the_wire_format(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+        for duration, minutes in [
+            ("175m", 175),
+            ("2h55m", 175),
+            ("95", 95),
+            ("2 horas 55 minutos", 175),
+        ]:
+            response = self.client.post(
+                "/api/movies/",
+                {
+                    "title": "Novo",
+                    "duration": duration,
+                    "genres": [],
+                    "premiere": "2021-01-01",
+                    "classification": 14,
+                    "synopsis": "Sinopse",
+                },
+                format="json",
+            )
+
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()["duration"], f"{minutes}m")
+            self.assertEqual(response.json()["premiere"], "2021-01-01")
+            self.assertEqual(
+                Movies.objects.get(id=response.json()["id"]).duration, minutes
+            )
+
+        response = self.client.post(
+            "/api/movies/",
+            {
+                "title": "Novo",
+                "duration": "longo",
+                "genres": [],
+                "premiere": "2021-01-01",
+                "classification": 14,
+                "synopsis": "Sinopse",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 422)
+
+        for duration in ["99999999999999999999999m", "2h55"]:
+            response = self.client.post(
+                "/api/movies/",
+                {
+                    "title": "Novo",
+                    "duration": duration,
+                    "genres": [],
+                    "premiere": "2021-01-01",
+                    "classification": 14,
+                    "synopsis": "Sinopse",
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, 422)
+            self.assertIn("duration", response.json())
+
+    def test_migration_parses_like_the_api(self):
+        migration = import_module(
+            "movies.migrations.0007_movies_typed_premiere_duration"
+        )
+
+        for duration in ["175m", "2h55m", "95", "2 horas 55 minutos", "2h55"]:
+            self.assertEqual(
+                migration.parse_duration(duration), parse_minutes(duration)
+            )
+
+        self.assertIsNone(migration.parse_duration("99999999999999999999999m"))
+        self.assertIsNone(migration.parse_premiere("1972"))
+        self.assertEqual(migration.parse_premiere("10/09/1972"), date(1972, 9, 10))
+
+
+class TestMovieFilters(APITestCase):
+    def setUp(self):
+        drama = Genres.objects.create(name="Drama")
+        crime = Genres.objects.create(name="Crime")
+        comedy = Genres.objects.create(name="Comédia")
+
+        for title, classification, average_stars, genres in [
+            ("Poderoso Chefão", 14, 9.5, [drama, crime]),
+            ("Nomadland", 12, 7.0, [drama]),
+            ("Curtindo a Vida", 10, None, [comedy]),
+            ("Cidade de Deus", 18, 8.0, [crime]),
+        ]:
+            movie = Movies.objects.create(
+                title=title,
+                duration=120,
+                premiere="2021-01-01",
+                classification=classification,
+                synopsis="Sinopse",
+                average_stars=average_stars,
+            )
+            movie.genres.set(genres)
+
+    def titles(self, **params):
+        response = self.client.get("/api/movies/", params)
+        self.assertEqual(response.status_code, 200)
+
+        return [movie["title"] for movie in response.json()]
+
+    def test_filter_by_genres(self):
+        self.assertEqual(self.titles(genre="drama"), ["Poderoso Chefão", "Nomadland"])
+        self.assertEqual(
+            self.titles(genre="Drama,CRIME"),
+            ["Poderoso Chefão", "Nomadland", "Cidade de Deus"],
+        )
+        self.assertEqual(self.titles(genre="Faroeste"), [])
+
+    def test_filter_by_classification(self):
+        self.assertEqual(self.titles(classification=12), ["Nomadland"])
+        self.assertEqual(
+            self.titles(min_classification=12, max_classification=14),
+            ["Poderoso Chefão", "Nomadland"],
+        )
+
+    def test_filter_by_min_stars(self):
+        self.assertEqual(
+            self.titles(min_stars=8), ["Poderoso Chefão", "Cidade de Deus"]
+        )
+        self.assertEqual(
+            self.titles(min_stars=8, genre="drama", max_classification=16),
+            ["Poderoso Chefão"],
+        )
+
+    def test_filters_use_indexes(self):
+        with connection.cursor() as cursor:
+            for column in ["classification", "average_stars"]:
+                cursor.execute(
+                    "EXPLAIN QUERY PLAN SELECT id FROM movies_movies "
+                    f"WHERE {column} >= 10"
+                )
+                self.assertIn(f"INDEX movies_movies_{column}", cursor.fetchall()[0][3])
+
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT genres_id FROM movies_genres_movies "
+                "WHERE movies_id = 1"
+            )
+            self.assertIn("USING COVERING INDEX", cursor.fetchall()[0][3])
+
+
+class TestMovieFastReadPath(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        user = User.objects.create_user(username="user", password="1234")
+        self.token = Token.objects.create(user=user)
+        critic = User.objects.create_user(
+            username="critic",
+            password="1234",
+            first_name="Jacques",
+            last_name="Delacroix",
+            is_staff=True,
+        )
+        drama = Genres.objects.create(name="Drama")
+        crime = Genres.objects.create(name="Crime")
+
+        for index in range(5):
+            movie = Movies.objects.create(
+                title=f"Liberdade {index}",
+                duration=100 + index,
+                premiere=f"20{10 + index}-03-0{index + 1}",
+                classification=14,
+                synopsis="Sinopse",
+            )
+            movie.genres.set([crime, drama][: index % 3])
+
+            if index % 2:
+                Review.objects.create(
+                    movie=movie, critic=critic, stars=7, review="Bom", spoilers=False
+                )
+                Review.objects.create(
+                    movie=movie, critic=None, stars=4, review="Ok", spoilers=True
+                )
+                Movies.objects.filter(id=movie.id).update(
+                    review_count=2, stars_sum=11, average_stars=5.5
+                )
+
+    def get(self, path, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+
+        return (
+            response.status_code,
+            response.content,
+            response.get("Link"),
+            len(queries),
+        )
+
+    def assertParity(self, path, params=None):
+        self.get(path, params)  # warms the token cache
+
+        with override_settings(MOVIES_FAST_READ_PATH=True):
+            fast = self.get(path, params)
+
+        with override_settings(MOVIES_FAST_READ_PATH=False):
+            slow = self.get(path, params)
+
+        self.assertEqual(fast, slow)
+
+        return fast
+
+    def test_matches_the_serializers(self):
+        for credentials in [{}, {"HTTP_AUTHORIZATION": "Token " + self.token.key}]:
+            self.client.credentials(**credentials)
+
+            self.assertParity("/api/movies/")
+            self.assertParity("/api/movies/", {"page_size": 2, "ordering": "premiere"})
+            self.assertParity("/api/movies/", {"title": "liberdade", "page_size": 2})
+            self.assertParity("/api/movies/", {"genre": "drama", "min_stars": 5})
+            self.assertParity("/api/movies/2/")
+            self.assertParity("/api/movies/1/")
+            self.assertParity("/api/movies/99/")
+            self.assertParity("/api/movies/abc/")
+
+    def test_fast_path_renders_rows(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+        status, content, _, _ = self.assertParity("/api/movies/2/")
+        movie = json.loads(content)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(movie["duration"], "101m")
+        self.assertEqual(movie["average_stars"], 5.5)
+        self.assertEqual(movie["genres"], [{"id": 2, "name": "Crime"}])
+        self.assertEqual(movie["reviews"][0]["critic"], None)
+
+
+class TestFastJSONRenderer(TestCase):
+    data = {
+        "id": 1,
+        "title": "Amélie Poulain",
+        "synopsis": "linha\u2028separada",
+        "premiere": date(2001, 4, 25),
+        "created": datetime(2021, 1, 1, 12, 30, 15, 123456),
+        "price": Decimal("9.90"),
+        "average_stars": 5.5,
+        "reviews": [{"spoilers": False, "critic": None}],
+        "detail": ErrorDetail("Not found.", code="not_found"),
+        "big": 2**70,
+    }
+
+    def renderers(self):
+        stdlib = FastJSONRenderer()
+        stdlib.use_orjson = False
+
+        return [stdlib, FastJSONRenderer()]
+
+    def test_matches_json_renderer(self):
+        expected = JSONRenderer().render(self.data)
+
+        for renderer in self.renderers():
+            self.assertEqual(renderer.render(self.data), expected)
+            self.assertEqual(renderer.render([1, "á"]), JSONRenderer().render([1, "á"]))
+            self.assertEqual(renderer.render(None), b"")
+
+    def test_indented_output_is_left_to_json_renderer(self):
+        for renderer in self.renderers():
+            self.assertEqual(
+                renderer.render(self.data, "application/json; indent=4"),
+                JSONRenderer().render(self.data, "application/json; indent=4"),
+            )
+
+    def test_is_the_default_renderer(self):
+        response = APIClient().get("/api/movies/")
+
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        user = User.objects.create_user(username="user", password="1234")
+        self.critic = User.objects.create_user(
+            username="critic", password="1234", first_name="Ana", is_staff=True
+        )
+        self.user_token = Token.objects.create(user=user)
+        self.critic_token = Token.objects.create(user=self.critic)
+
+        self.movie = Movies.objects.create(
+            title="Nomadland",
+            duration=110,
+            premiere="2021-04-15",
+            classification=14,
+            synopsis="Sinopse",
+        )
+        self.other = Movies.objects.create(
+            title="Minari",
+            duration=115,
+            premiere="2021-02-12",
+            classification=12,
+            synopsis="Sinopse",
+        )
+        Review.objects.create(
+            movie=self.movie, critic=self.critic, stars=8, review="Bom", spoilers=False
+        )
+        Movies.objects.filter(id=self.movie.id).update(
+            review_count=1, stars_sum=8, average_stars=8
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user_token.key)
+
+    def get(self, path, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+
+        return self.client.get(path, **headers)
+
+    def assertNotModified(self, path, etag):
+        with self.assertNumQueries(0):
+            response = self.get(path, etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_retrieve_not_modified_without_queries(self):
+        path = f"/api/movies/{self.movie.id}/"
+        response = self.get(path)
+        etag = response["ETag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Authorization", response["Vary"])
+        self.assertNotModified(path, etag)
+        self.assertEqual(self.get(path, '"other"').status_code, 200)
+
+    def test_list_not_modified_without_queries(self):
+        response = self.get("/api/movies/")
+
+        self.assertNotModified("/api/movies/", response["ETag"])
+        self.assertNotEqual(
+            self.get("/api/movies/?page_size=1")["ETag"], response["ETag"]
+        )
+
+    def test_anonymous_cached_responses_are_conditional(self):
+        self.client.credentials()
+        path = f"/api/movies/{self.movie.id}/"
+        etag = self.get(path)["ETag"]
+
+        self.assertEqual(self.get(path)["ETag"], etag)
+        self.assertNotModified(path, etag)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user_token.key)
+        self.assertNotEqual(self.get(path)["ETag"], etag)
+
+    def test_etag_changes_with_the_movie(self):
+        path = f"/api/movies/{self.movie.id}/"
+        other_path = f"/api/movies/{self.other.id}/"
+        list_etag = self.get("/api/movies/")["ETag"]
+        other_etag = self.get(other_path)["ETag"]
+
+        def rename_genre():
+            genre = Genres.objects.get(name="Drama")
+            genre.name = "Drama policial"
+            genre.save()
+
+        def rename_critic():
+            self.critic.last_name = "Silva"
+            self.critic.save()
+
+        changes = [
+            lambda: self.movie.genres.add(Genres.objects.create(name="Drama")),
+            rename_genre,
+            lambda: Review.objects.get(movie=self.movie).delete(),
+            lambda: Review.objects.create(
+                movie=self.movie, critic=self.critic, stars=5, review="Ok", spoilers=1
+            ),
+            rename_critic,
+        ]
+
+        for change in changes:
+            etag = self.get(path)["ETag"]
+            change()
+            response = self.get(path, etag)
+
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+        self.assertEqual(response.json()["reviews"][0]["critic"]["last_name"], "Silva")
+        self.assertNotEqual(self.get("/api/movies/")["ETag"], list_etag)
+        self.assertEqual(self.get(other_path, other_etag).status_code, 304)
+
+    def test_critic_login_keeps_etags(self):
+        path = f"/api/movies/{self.movie.id}/"
+        etag = self.get(path)["ETag"]
+
+        self.client.credentials()
+        self.client.post("/api/login/", {"username": "critic", "password": "1234"})
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.user_token.key)
+
+        self.assertEqual(self.get(path, etag).status_code, 304)
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    async def slow_app(self, scope, receive, send):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        status = 200 if scope["path"] != "/api/movies/missing/" else 404
+
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": f"{self.calls}".encode()})
+
+    def request(self, path, headers=()):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), *headers],
+        }
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        return scope, receive, send, sent
+
+    def run_concurrently(self, app, requests):
+        async def run():
+            await asyncio.gather(
+                *(app(scope, receive, send) for scope, receive, send, _ in requests)
+            )
+
+        asyncio.run(run())
+
+        return [sent[-1]["body"] for *_, sent in requests]
+
+    def test_identical_anonymous_reads_share_one_response(self):
+        app = SingleFlightMiddleware(self.slow_app)
+        requests = [self.request("/api/movies/1/") for _ in range(20)]
+
+        self.assertEqual(self.run_concurrently(app, requests), [b"1"] * 20)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(app.in_flight, {})
+
+    def test_other_requests_run_independently(self):
+        app = SingleFlightMiddleware(self.slow_app)
+        requests = [
+            self.request("/api/movies/1/"),
+            self.request("/api/movies/2/"),
+            self.request("/api/movies/1/", [(b"authorization", b"Token x")]),
+            self.request("/api/reviews/"),
+        ]
+
+        self.run_concurrently(app, requests)
+        self.assertEqual(self.calls, 4)
+
+    def test_errors_are_not_shared(self):
+        app = SingleFlightMiddleware(self.slow_app)
+        requests = [self.request("/api/movies/missing/") for _ in range(3)]
+
+        self.run_concurrently(app, requests)
+        self.assertEqual(self.calls, 3)
+
+    @override_settings(SINGLE_FLIGHT_TIMEOUT=0.01)
+    def test_waiters_give_up_after_the_timeout(self):
+        app = SingleFlightMiddleware(self.slow_app)
+        requests = [self.request("/api/movies/1/") for _ in range(3)]
+
+        self.run_concurrently(app, requests)
+        self.assertEqual(self.calls, 3)
+
+    def test_asgi_application_coalesces(self):
+        requests = [self.request("/api/movies/") for _ in range(5)]
+        bodies = self.run_concurrently(asgi_application, requests)
+
+        # the handler's thread keeps its persistent connection otherwise
+        asyncio.run(sync_to_async(connections.close_all)())
+
+        self.assertIsInstance(asgi_application, SingleFlightMiddleware)
+        self.assertEqual([sent[0]["status"] for *_, sent in requests], [200] * 5)
+        self.assertEqual(len(set(bodies)), 1)
+
+
+@override_settings(REPLICA_DATABASES=["replica"])
+class TestReplicaRouting(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+
+        critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        self.token = Token.objects.create(user=critic)
+        self.movie = Movies.objects.create(
+            title="Nomadland",
+            duration=110,
+            premiere="2021-04-15",
+            classification=14,
+            synopsis="Sinopse",
+        )
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def queries(self, method, path, data=None):
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = getattr(self.client, method)(path, data, format="json")
+
+        self.assertLess(response.status_code, 400)
+
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica(self):
+        path = f"/api/movies/{self.movie.id}/reviews/"
+
+        self.assertGreater(self.queries("get", path)[1], 0)
+        self.assertEqual(self.queries("get", "/api/reviews/")[0], 0)
+
+    def restore_journal_mode(self):
+        # leaving WAL takes the only connection to the database
+        connections["replica"].close()
+
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = DELETE")
+
+    def test_cached_and_etagged_reads_use_the_primary(self):
+        replica = connections["replica"]
+        path = f"/api/movies/{self.movie.id}/"
+        client = APIClient()
+
+        # the replica keeps reading the snapshot from before the update,
+        # which takes WAL: with the stock rollback journal it blocks writers
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = WAL")
+
+        self.addCleanup(self.restore_journal_mode)
+
+        replica.ensure_connection()
+        replica.connection.execute("BEGIN")
+        replica.connection.execute("SELECT title FROM movies_movies").fetchall()
+
+        try:
+            Movies.objects.filter(id=self.movie.id).update(title="Nomadland (2020)")
+            bump_versions(self.movie.id)
+
+            first = client.get(path)
+            second = client.get(path)
+        finally:
+            replica.connection.execute("ROLLBACK")
+
+        self.assertEqual(first.json()["title"], "Nomadland (2020)")
+        self.assertEqual(second.json()["title"], "Nomadland (2020)")
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_writers_read_from_the_primary_for_a_while(self):
+        review = {"stars": 8, "review": "Bom", "spoilers": False}
+        primary, replica = self.queries(
+            "post", f"/api/movies/{self.movie.id}/review/", review
+        )
+
+        self.assertEqual(replica, 0)
+
+        primary, replica = self.queries("get", f"/api/movies/{self.movie.id}/reviews/")
+        self.assertEqual(replica, 0)
+        self.assertEqual(self.queries("get", "/api/reviews/")[1], 0)
+
+        cache.delete(f"replica:pin:{self.token.user_id}")
+        self.assertGreater(self.queries("get", "/api/reviews/")[1], 0)
+
+    def test_other_reads_and_migrations_use_the_primary(self):
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Movies), "default")
+        self.assertEqual(router.db_for_write(Movies), "default")
+        self.assertFalse(router.allow_migrate("replica", "movies"))
+        self.assertTrue(router.allow_migrate("default", "movies"))
+
+
+class TestSQLiteProfile(TestCase):
+    @skipIf("KMDB_SQLITE_PROFILE" in os.environ, "a profile was picked")
+    def test_stock_is_the_default(self):
+        self.assertEqual(settings.SQLITE_PROFILE, "stock")
+        self.assertNotIsInstance(connection, SQLiteProfileWrapper)
+
+    def test_connections_get_the_production_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = SQLiteProfileWrapper(
+                {
+                    **settings.DATABASES["default"],
+                    **settings.SQLITE_PROFILES["production"],
+                    "NAME": os.path.join(directory, "profile.sqlite3"),
+                },
+                alias="profile",
+            )
+
+            with wrapper.cursor() as cursor:
+                for name, value in [
+                    ("journal_mode", "wal"),
+                    ("busy_timeout", 5000),
+                    ("cache_size", -64000),
+                ]:
+                    cursor.execute(f"PRAGMA {name}")
+                    self.assertEqual(cursor.fetchone()[0], value)
+
+            wrapper.close()
+
+        self.assertEqual(wrapper.transaction_mode, "IMMEDIATE")
+
+    def test_benchmark_compares_profiles(self):
+        report = SQLiteConcurrencyBenchmark(
+            readers=2, writers=2, seconds=0.3, movies=20
+        ).run()
+
+        self.assertEqual(set(report["results"]), {"stock", "production"})
+        self.assertGreater(report["results"]["production"]["write"]["per_second"], 0)
+        self.assertEqual(report["results"]["production"]["write"]["locked"], 0)
+
+
+class TestUniqueReview(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+
+        critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        self.token = Token.objects.create(user=critic)
+        self.movie = Movies.objects.create(
+            title="Nomadland",
+            duration=110,
+            premiere="2021-04-15",
+            classification=14,
+            synopsis="Sinopse",
+        )
+
+    def post_review(self, stars=8):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+        return client.post(
+            f"/api/movies/{self.movie.id}/review/",
+            {"stars": stars, "review": "Bom", "spoilers": False},
+            format="json",
+        )
+
+    def test_review_is_created_without_an_existence_query(self):
+        self.post_review()  # warms the token cache
+        Review.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_review()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith('SELECT "movies_review"')
+            ]
+        )
+
+    def test_concurrent_duplicates_are_rejected(self):
+        writers = 8
+        barrier = threading.Barrier(writers)
+        responses = []
+
+        def write(stars):
+            barrier.wait()
+            responses.append(self.post_review(stars))
+            connection.close()
+
+        threads = [
+            threading.Thread(target=write, args=(stars,))
+            for stars in range(1, writers + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(statuses, [201] + [422] * (writers - 1))
+        self.assertEqual(
+            [response.json() for response in responses if response.status_code == 422],
+            [{"detail": "You already made this review."}] * (writers - 1),
+        )
+
+        review = Review.objects.get()
+        self.movie.refresh_from_db()
+        self.assertEqual(
+            (self.movie.review_count, self.movie.stars_sum), (1, review.stars)
+        )
+
+
+class TestBulkReviews(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        self.token = Token.objects.create(user=self.critic)
+        self.movies = [
+            Movies.objects.create(
+                title=f"Filme {index}",
+                duration=100,
+                premiere="2021-01-01",
+                classification=14,
+                synopsis="Sinopse",
+            )
+            for index in range(3)
+        ]
+        Review.objects.create(
+            movie=self.movies[2], critic=self.critic, stars=5, review="Ok", spoilers=0
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def submit(self, items):
+        return self.client.post("/api/reviews/bulk/", items, format="json")
+
+    def item(self, movie_id, stars=8):
+        return {
+            "movie_id": movie_id,
+            "stars": stars,
+            "review": "Bom",
+            "spoilers": False,
+        }
+
+    def test_reports_every_item(self):
+        first, second, reviewed = [movie.id for movie in self.movies]
+        response = self.submit(
+            [
+                self.item(first, 8),
+                self.item(99),
+                self.item(reviewed),
+                self.item(second, 6),
+                self.item(first, 2),
+                {"movie_id": second, "stars": 11},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["created"], 2)
+        self.assertEqual(
+            [result["status"] for result in body["results"]],
+            ["created", "not_found", "duplicate", "created", "duplicate", "invalid"],
+        )
+        self.assertIn("stars", body["results"][5]["errors"])
+
+        review = Review.objects.get(id=body["results"][0]["id"])
+        self.assertEqual((review.movie_id, review.stars), (first, 8))
+        self.assertEqual(review.critic, self.critic)
+
+        self.movies[1].refresh_from_db()
+        self.assertEqual(
+            (self.movies[1].review_count, self.movies[1].average_stars), (1, 6.0)
+        )
+
+    def test_query_count_does_not_grow_with_items(self):
+        self.submit([])  # warms the token cache
+        items = [self.item(movie.id) for movie in self.movies[:2]] + [self.item(99)]
+
+        # SAVEPOINT, movies, existing reviews, INSERT, new ids, ratings,
+        # histograms, RELEASE
+        with self.assertNumQueries(8):
+            response = self.submit(items)
+
+        self.assertEqual(response.json()["created"], 2)
+
+    def test_out_of_range_movie_ids_are_invalid(self):
+        response = self.submit([self.item(10**30), self.item(0)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["invalid", "invalid"],
+        )
+
+    def test_review_added_after_the_check_is_a_duplicate(self):
+        first, second, _ = [movie.id for movie in self.movies]
+        Review.objects.create(
+            movie=self.movies[0], critic=self.critic, stars=3, review="Ok", spoilers=0
+        )
+        checks = [set()]  # the first check misses the review just added
+
+        def reviewed(critic, movie_ids):
+            return checks.pop() if checks else reviewed_movies(critic, movie_ids)
+
+        with mock.patch("movies.bulk_reviews.reviewed_movies", reviewed):
+            response = self.submit([self.item(first), self.item(second, 6)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["status"] for result in response.json()["results"]],
+            ["duplicate", "created"],
+        )
+        self.movies[1].refresh_from_db()
+        self.assertEqual(self.movies[1].review_count, 1)
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.submit({"movie_id": 1}).status_code, 422)
+
+        with mock.patch.object(ReviewView, "max_bulk_reviews", 1):
+            response = self.submit([self.item(1), self.item(2)])
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_only_critics_can_submit(self):
+        User = get_user_model()
+        user = User.objects.create_user(username="user", password="1234")
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+        self.assertEqual(self.submit([self.item(1)]).status_code, 403)
+
+
+class TestReviewUpdate(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        token = Token.objects.create(user=self.critic)
+        self.movie = Movies.objects.create(
+            title="Filme",
+            duration=100,
+            premiere="2021-01-01",
+            classification=14,
+            synopsis="Sinopse",
+            review_count=1,
+            stars_sum=4,
+            average_stars=4.0,
+        )
+        self.review = Review.objects.create(
+            movie=self.movie, critic=self.critic, stars=4, review="Ok", spoilers=False
+        )
+        self.url = f"/api/movies/{self.movie.id}/review/"
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+    def assertRating(self, stars_sum, average_stars):
+        self.movie.refresh_from_db()
+        self.assertEqual(
+            (self.movie.review_count, self.movie.stars_sum, self.movie.average_stars),
+            (1, stars_sum, average_stars),
+        )
+
+    def test_updates_review_rating_and_histogram_in_three_queries(self):
+        self.client.get("/api/reviews/")  # warms the token cache
+
+        # SAVEPOINT, UPDATE movie RETURNING, UPDATE review RETURNING,
+        # histogram upsert, RELEASE
+        with self.assertNumQueries(5):
+            response = self.client.put(
+                self.url, {"stars": 9, "review": "Ótimo", "spoilers": True}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "id": self.review.id,
+                "critic": {"id": self.critic.id, "first_name": "", "last_name": ""},
+                "stars": 9,
+                "review": "Ótimo",
+                "spoilers": True,
+            },
+        )
+        self.assertRating(9, 9.0)
+
+    def test_partial_update_keeps_other_fields(self):
+        response = self.client.put(self.url, {"review": "Mudei de ideia"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stars"], 4)
+        self.assertEqual(Review.objects.get().review, "Mudei de ideia")
+        self.assertRating(4, 4.0)
+
+    def test_validates_data(self):
+        response = self.client.put(self.url, {"stars": 11})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Review.objects.get().stars, 4)
+
+    def test_missing_movie_or_review(self):
+        self.assertEqual(
+            self.client.put("/api/movies/999/review/", {"stars": 9}).status_code, 404
+        )
+
+        # a queryset delete leaves the movie aggregates alone
+        Review.objects.filter(id=self.review.id).delete()
+
+        self.assertEqual(self.client.put(self.url, {"stars": 9}).status_code, 404)
+        self.assertRating(4, 4.0)
+
+    def test_without_returning(self):
+        with mock.patch("movies.review_update.supports_returning", return_value=False):
+            response = self.client.put(self.url, {"stars": 2})
+
+        self.assertEqual(response.json()["stars"], 2)
+        self.assertRating(2, 2.0)
+
+
+@override_settings(MOVIE_REVIEWS_LIMIT=3)
+class TestNestedReviews(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        user = User.objects.create_user(username="user", password="1234")
+        token = Token.objects.create(user=user)
+        self.movies = []
+
+        for index, reviews in enumerate([7, 2]):
+            movie = Movies.objects.create(
+                title=f"Filme {index}",
+                duration=100,
+                premiere="2021-01-01",
+                classification=14,
+                synopsis="Sinopse",
+                review_count=reviews,
+            )
+            Review.objects.bulk_create(
+                Review(movie=movie, stars=stars % 10 + 1, review="Ok", spoilers=False)
+                for stars in range(reviews)
+            )
+            self.movies.append(movie)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + token.key)
+
+    def review_ids(self, movie, *ordering):
+        return list(
+            Review.objects.filter(movie=movie)
+            .order_by(*ordering)
+            .values_list("id", flat=True)
+        )
+
+    def test_detail_nests_the_newest_reviews_and_links_the_rest(self):
+        movie = self.client.get(f"/api/movies/{self.movies[0].id}/").json()
+        expected = self.review_ids(self.movies[0], "-id")
+
+        self.assertEqual([review["id"] for review in movie["reviews"]], expected[:3])
+
+        ids = []
+        url = movie["reviews_next"] + "&page_size=2"
+
+        while url:
+            response = self.client.get(url)
+            ids += [review["id"] for review in response.json()]
+            url = response.get("Link", "")[1:].split(">")[0]
+
+        self.assertEqual(ids, expected[3:])
+
+    def test_orders_by_stars(self):
+        movie = self.client.get(
+            f"/api/movies/{self.movies[0].id}/", {"reviews_ordering": "stars"}
+        ).json()
+        expected = self.review_ids(self.movies[0], "-stars", "-id")
+
+        self.assertEqual([review["id"] for review in movie["reviews"]], expected[:3])
+
+        response = self.client.get(movie["reviews_next"])
+        self.assertEqual([review["id"] for review in response.json()], expected[3:])
+
+    def test_list_caps_every_movie(self):
+        for fast in (True, False):
+            with self.settings(MOVIES_FAST_READ_PATH=fast):
+                movies = self.client.get("/api/movies/").json()
+
+            self.assertEqual([len(movie["reviews"]) for movie in movies], [3, 2])
+            self.assertIsNotNone(movies[0]["reviews_next"])
+            self.assertIsNone(movies[1]["reviews_next"])
+
+    def test_detail_queries_do_not_grow_with_reviews(self):
+        url = f"/api/movies/{self.movies[0].id}/"
+        self.client.get(url)  # warms the token cache
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+
+        Review.objects.bulk_create(
+            Review(movie=self.movies[0], stars=5, review="Ok", spoilers=False)
+            for _ in range(100)
+        )
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(response.json()["reviews"]), 3)
+
+    def test_reviews_endpoint(self):
+        self.assertEqual(self.client.get("/api/movies/999/reviews/").status_code, 404)
+
+        empty = Movies.objects.create(
+            title="Vazio",
+            duration=100,
+            premiere="2021-01-01",
+            classification=14,
+            synopsis="Sinopse",
+        )
+        response = self.client.get(f"/api/movies/{empty.id}/reviews/")
+        self.assertEqual((response.status_code, response.json()), (200, []))
+
+        payload = json.dumps({"o": "stars", "p": ["x", 1]}).encode()
+        response = self.client.get(
+            f"/api/movies/{empty.id}/reviews/",
+            {"ordering": "stars", "cursor": urlsafe_b64encode(payload).decode()},
+        )
+        self.assertEqual(response.status_code, 404)
+
+        self.client.credentials()
+        response = self.client.get(f"/api/movies/{empty.id}/reviews/")
+        self.assertEqual(response.status_code, 401)
+
+
+class TestSparseFields(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.critic = User.objects.create_user(
+            username="critic", password="1234", is_staff=True
+        )
+        self.token = Token.objects.create(user=self.critic)
+        drama = Genres.objects.create(name="Drama")
+
+        for index in range(3):
+            movie = Movies.objects.create(
+                title=f"Filme {index}",
+                duration=100,
+                premiere=f"2021-01-0{index + 1}",
+                classification=14,
+                synopsis="Sinopse",
+                review_count=1,
+                stars_sum=5,
+                average_stars=5.0,
+            )
+            movie.genres.set([drama])
+            Review.objects.create(
+                movie=movie, critic=self.critic, stars=5, review="Ok", spoilers=False
+            )
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+        self.client.get("/api/reviews/")  # warms the token cache
+
+    def get(self, path, params):
+        results = []
+
+        for fast in (True, False):
+            cache.clear()
+
+            with self.settings(MOVIES_FAST_READ_PATH=fast), CaptureQueriesContext(
+                connection
+            ) as queries:
+                response = self.client.get(path, params)
+
+            results.append((response.content, [query["sql"] for query in queries]))
+
+        self.assertEqual(results[0][0], results[1][0])
+
+        return json.loads(results[0][0]), results[0][1]
+
+    def test_selects_movie_fields_and_columns(self):
+        movies, queries = self.get("/api/movies/", {"fields": "id,title"})
+
+        self.assertEqual(movies[0], {"id": movies[0]["id"], "title": "Filme 0"})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("synopsis", queries[0])
+
+        movie, queries = self.get(
+            f"/api/movies/{movies[1]['id']}/", {"fields": "title"}
+        )
+        self.assertEqual(movie, {"title": "Filme 1"})
+
+    def test_unknown_fields_are_rejected(self):
+        for params in [{"fields": "bogus"}, {"fields": "id", "expand": "reviews"}]:
+            body, queries = self.get("/api/movies/", params)
+
+            self.assertEqual(queries, [])
+            self.assertIn("title", body["fields"])
+            self.assertNotIn("reviews", body["fields"])
+
+        response = self.client.get("/api/movies/", {"fields": "bogus"})
+        self.assertEqual(response.status_code, 400)
+
+        self.authenticate()
+        response = self.client.get("/api/reviews/", {"fields": "id,bogus"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Unknown fields: bogus.")
+
+    def test_expands_relations(self):
+        movies, queries = self.get(
+            "/api/movies/", {"fields": "title", "expand": "genres"}
+        )
+
+        self.assertEqual(
+            movies[0], {"title": "Filme 0", "genres": [{"id": 1, "name": "Drama"}]}
+        )
+        self.assertEqual(len(queries), 2)
+
+    def test_reviews_only_when_selected(self):
+        self.authenticate()
+
+        movies, queries = self.get("/api/movies/", {"fields": "id,title"})
+        self.assertEqual(set(movies[0]), {"id", "title"})
+        self.assertEqual(len(queries), 1)
+
+        movies, queries = self.get(
+            "/api/movies/", {"fields": "id", "expand": "reviews"}
+        )
+        self.assertEqual(set(movies[0]), {"id", "reviews", "reviews_next"})
+        self.assertEqual(movies[0]["reviews"][0]["review"], "Ok")
+        self.assertEqual(len(queries), 2)
+
+    def test_selects_review_fields(self):
+        self.authenticate()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/reviews/", {"fields": "id,stars"})
+
+        self.assertEqual(response.json()[0], {"id": 1, "stars": 5})
+        self.assertNotIn("accounts_user", queries[-1]["sql"])
+        self.assertNotIn("spoilers", queries[-1]["sql"])
+
+        response = self.client.get("/api/reviews/", {"fields": "critic"})
+        self.assertEqual(
+            response.json()[0],
+            {"critic": {"id": self.critic.id, "first_name": "", "last_name": ""}},
+        )
+
+
+class TestStarHistograms(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+
+        self.critics = []
+
+        for index in range(3):
+            critic = User.objects.create_user(
+                username=f"critic{index}", password="1234", is_staff=True
+            )
+            self.critics.append((critic, Token.objects.create(user=critic).key))
+
+        self.movies = [
+            Movies.objects.create(
+                title=f"Filme {index}",
+                duration=100,
+                premiere="2021-01-01",
+                classification=14,
+                synopsis="Sinopse",
+            )
+            for index in range(2)
+        ]
+
+    def as_critic(self, index):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.critics[index][1])
+
+    def review(self, stars, spoilers=False):
+        return {"stars": stars, "review": "Ok", "spoilers": spoilers}
+
+    def stats(self, movie):
+        self.client.credentials()
+
+        return self.client.get(f"/api/movies/{movie.id}/stats/")
+
+    def histograms(self):
+        return list(StarHistogram.objects.order_by("movie_id").values())
+
+    def test_follows_review_writes(self):
+        url = f"/api/movies/{self.movies[0].id}/review/"
+
+        self.as_critic(0)
+        self.client.post(url, self.review(8, spoilers=True), format="json")
+        self.as_critic(1)
+        self.client.post(url, self.review(3), format="json")
+        self.as_critic(2)
+        self.client.post(
+            "/api/reviews/bulk/",
+            [
+                {"movie_id": self.movies[0].id, **self.review(10)},
+                {"movie_id": self.movies[1].id, **self.review(6, spoilers=True)},
+            ],
+            format="json",
+        )
+        self.as_critic(1)
+        self.client.put(url, self.review(4, spoilers=True), format="json")
+
+        response = self.stats(self.movies[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "review_count": 3,
+                "histogram": {
+                    **{str(stars): 0 for stars in range(1, 11)},
+                    "4": 1,
+                    "8": 1,
+                    "10": 1,
+                },
+                "mean": 22 / 3,
+                "median": 8.0,
+                "spoiler_ratio": 2 / 3,
+            },
+        )
+
+        Review.objects.get(critic=self.critics[0][0]).delete()
+        stats = self.stats(self.movies[0]).json()
+        self.assertEqual((stats["review_count"], stats["median"]), (2, 7.0))
+        self.assertEqual(stats["spoiler_ratio"], 0.5)
+
+        incremental = self.histograms()
+        out = StringIO()
+        call_command("rebuild_star_histograms", stdout=out)
+
+        self.assertEqual(self.histograms(), incremental)
+        self.assertIn("2 movies", out.getvalue())
+
+    def test_movie_without_reviews(self):
+        with self.assertNumQueries(2):
+            response = self.stats(self.movies[1])
+
+        self.assertEqual(response.json()["review_count"], 0)
+        self.assertIsNone(response.json()["median"])
+        self.assertEqual(self.stats(Movies(id=999)).status_code, 404)
+
+    def test_served_from_the_histogram_row(self):
+        StarHistogram.objects.create(movie=self.movies[0], stars_2=3, stars_9=1)
+
+        with self.assertNumQueries(1):
+            response = self.stats(self.movies[0])
+
+        self.assertEqual(response.json()["median"], 2.0)
+        self.assertEqual(response.json()["mean"], 3.75)
+
+        response = self.client.get(
+            f"/api/movies/{self.movies[0].id}/stats/",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
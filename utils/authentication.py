@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.authentication import TokenAuthentication
+
+
+def freeze(instance):
+    """The database alias and concrete field values of a model instance."""
+    return instance._state.db, {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def thaw(model, frozen):
+    """A new instance of `model` from what `freeze` returned."""
+    db, values = frozen
+
+    return model.from_db(db, list(values), list(values.values()))
+
+
+class TokenCache:
+    """
+    Thread-safe LRU map of token key -> frozen (user, token) with a TTL,
+    local to the process. Entries are evicted by the model signals in
+    accounts.signals, so queryset update()s, which send none, and changes
+    made by another process are only seen once the TTL runs out.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            value, expires = entry
+
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            keys = [
+                key
+                for key, ((user, (db, token)), expires) in self._entries.items()
+                if token["user_id"] == user_id
+            ]
+
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_entries=getattr(settings, "TOKEN_CACHE_MAX_ENTRIES", 10000),
+    timeout=getattr(settings, "TOKEN_CACHE_TIMEOUT", 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, (freeze(user), freeze(token)))
+
+            return user, token
+
+        # new instances for every request, so none sees another's changes
+        user = thaw(get_user_model(), cached[0])
+        token = thaw(self.get_model(), cached[1])
+        token.user = user
+
+        return user, token
@@ -0,0 +1,87 @@
+import asyncio
+
+from django.conf import settings
+
+
+class SingleFlightMiddleware:
+    """
+    ASGI middleware that coalesces concurrent identical anonymous GETs: the
+    first request runs the application, the ones arriving while it is in
+    flight wait up to `timeout` seconds and replay its response. Waiters
+    that time out, or whose leader fails or answers anything but a 200,
+    run the application themselves.
+    """
+
+    # headers that change the response of an anonymous GET
+    key_headers = (b"host", b"accept", b"if-none-match")
+
+    def __init__(self, app):
+        self.app = app
+        self.path_prefixes = tuple(settings.SINGLE_FLIGHT_PATHS)
+        self.timeout = settings.SINGLE_FLIGHT_TIMEOUT
+        self.in_flight = {}
+
+    def get_key(self, scope):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return None
+
+        if not scope["path"].startswith(self.path_prefixes):
+            return None
+
+        headers = dict(scope["headers"])
+
+        if b"authorization" in headers:
+            return None
+
+        return (
+            scope["method"],
+            scope["path"],
+            scope["query_string"],
+            *(headers.get(name) for name in self.key_headers),
+        )
+
+    async def __call__(self, scope, receive, send):
+        key = self.get_key(scope)
+
+        if key is None:
+            return await self.app(scope, receive, send)
+
+        leader = self.in_flight.get(key)
+
+        if leader is None:
+            return await self.lead(key, scope, receive, send)
+
+        try:
+            messages = await asyncio.wait_for(asyncio.shield(leader), self.timeout)
+        except asyncio.TimeoutError:
+            messages = None
+
+        if messages is None:
+            return await self.app(scope, receive, send)
+
+        for message in messages:
+            await send(message)
+
+    async def lead(self, key, scope, receive, send):
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            del self.in_flight[key]
+
+            future.set_result(messages if self.is_shareable(messages) else None)
+
+    def is_shareable(self, messages):
+        # only complete 200s, a leader whose client went away may stop early
+        return (
+            len(messages) > 1
+            and messages[0].get("status") == 200
+            and not messages[-1].get("more_body", False)
+        )
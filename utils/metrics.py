@@ -0,0 +1,156 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+        return lines
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_time = 0
+        self.statuses = defaultdict(int)
+
+
+class MetricsRegistry:
+    """
+    Per-process aggregation of request metrics keyed by (view, action),
+    rendered in the Prometheus text exposition format.
+    """
+
+    prefix = "kmdb"
+
+    def __init__(self):
+        self._views = defaultdict(ViewMetrics)
+        self._lock = threading.Lock()
+
+    def observe(self, view, action, status, duration, queries, db_time, size):
+        with self._lock:
+            metrics = self._views[(view, action)]
+            metrics.latency.observe(duration)
+            metrics.queries.observe(queries)
+            metrics.db_time += db_time
+            metrics.statuses[f"{status // 100}xx"] += 1
+
+            if size is not None:
+                metrics.response_size.observe(size)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        sections = {
+            "request_duration_seconds": ("histogram", "Request latency."),
+            "db_queries": ("histogram", "Database queries per request."),
+            "response_size_bytes": ("histogram", "Response body size."),
+            "db_duration_seconds_total": ("counter", "Time spent in the database."),
+            "requests_total": ("counter", "Requests by status class."),
+        }
+        samples = {name: [] for name in sections}
+
+        with self._lock:
+            for (view, action), metrics in sorted(self._views.items()):
+                labels = f'view="{view}",action="{action}"'
+
+                samples["request_duration_seconds"] += metrics.latency.render(
+                    f"{self.prefix}_request_duration_seconds", labels
+                )
+                samples["db_queries"] += metrics.queries.render(
+                    f"{self.prefix}_db_queries", labels
+                )
+                samples["response_size_bytes"] += metrics.response_size.render(
+                    f"{self.prefix}_response_size_bytes", labels
+                )
+                samples["db_duration_seconds_total"].append(
+                    f"{self.prefix}_db_duration_seconds_total{{{labels}}} "
+                    f"{metrics.db_time}"
+                )
+                samples["requests_total"] += [
+                    f'{self.prefix}_requests_total{{{labels},status="{status}"}} '
+                    f"{count}"
+                    for status, count in sorted(metrics.statuses.items())
+                ]
+
+        lines = []
+
+        for name, (kind, description) in sections.items():
+            lines.append(f"# HELP {self.prefix}_{name} {description}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+            lines += samples[name]
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def get_view_labels(request):
+    view_func = getattr(request, "metrics_view", None)
+
+    if view_func is None:
+        return "unmatched", request.method.lower()
+
+    view_class = getattr(view_func, "cls", view_func)
+    actions = getattr(view_func, "actions", None) or {}
+    method = request.method.lower()
+
+    return view_class.__name__, actions.get(method, method)
+
+
+def count_queries(counter):
+    stack = ExitStack()
+
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+
+    return stack
@@ -0,0 +1,58 @@
+import time
+
+from utils.metrics import QueryCounter, count_queries, get_view_labels, registry
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+
+        with count_queries(counter):
+            response = self.get_response(request)
+
+        view, action = get_view_labels(request)
+
+        def observe(size):
+            registry.observe(
+                view,
+                action,
+                response.status_code,
+                time.perf_counter() - start,
+                counter.count,
+                counter.duration,
+                size,
+            )
+
+        if response.streaming:
+            # recorded once the last chunk is sent, or the client goes away
+            response.streaming_content = self.measure_stream(
+                response.streaming_content, counter, observe
+            )
+        else:
+            observe(len(response.content))
+
+        return response
+
+    def measure_stream(self, content, counter, observe):
+        size = 0
+        chunks = iter(content)
+
+        try:
+            while True:
+                with count_queries(counter):
+                    chunk = next(chunks, None)
+
+                if chunk is None:
+                    break
+
+                size += len(chunk)
+                yield chunk
+        finally:
+            observe(size)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_func
@@ -1,8 +1,244 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from rest_framework import mixins
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.viewsets import GenericViewSet
 
+from utils.routers import is_pinned_to_primary, pin_to_primary, replica_reads
+
 
 class CreateUpdateViewSet(
     mixins.UpdateModelMixin, mixins.CreateModelMixin, GenericViewSet
 ):
     pass
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Serve anonymous GETs of `cached_actions` from rendered bytes stored under
+    a key that embeds the version returned by `get_cache_version`. Writes
+    bump the version, so stale entries are simply never looked up again.
+    """
+
+    cached_actions = ("list", "retrieve")
+    cache_key_prefix = "response"
+
+    def get_cache_version(self, action, **kwargs):
+        raise NotImplementedError
+
+    def get_cache_key(self, request, action, **kwargs):
+        if request.method != "GET" or "HTTP_AUTHORIZATION" in request.META:
+            return None
+
+        if action not in self.cached_actions:
+            return None
+
+        version = self.get_cache_version(action, **kwargs)
+
+        if version is None:
+            return None
+
+        # hashed, so spaces in Accept or a long URI never make an invalid
+        # memcached key
+        variant = "\n".join(
+            [request.META.get("HTTP_ACCEPT", ""), request.build_absolute_uri()]
+        )
+        digest = hashlib.blake2b(variant.encode(), digest_size=16).hexdigest()
+
+        return ":".join([self.cache_key_prefix, str(version), digest])
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower())
+        key = self.get_cache_key(request, action, **kwargs)
+
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        cached = cache.get(key)
+
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+
+            for header, value in headers:
+                response[header] = value
+
+            return get_conditional_response(
+                request, etag=response.get("ETag"), response=response
+            )
+
+        response = super().dispatch(request, *args, **kwargs)
+
+        if response.status_code == 200:
+            response.render()
+            cache.set(
+                key,
+                (response.content, list(response.items())),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags for GETs of `etag_actions`, built from the version returned
+    by `get_cache_version` plus everything that changes the representation.
+    Call `get_not_modified_response` first thing in the handler: a matching
+    If-None-Match is answered before any row is read or rendered.
+    """
+
+    etag_actions = ("list", "retrieve")
+
+    def get_etag(self, request):
+        if (
+            request.method not in ("GET", "HEAD")
+            or self.action not in self.etag_actions
+        ):
+            return None
+
+        version = self.get_cache_version(self.action, **self.kwargs)
+
+        if version is None:
+            return None
+
+        variant = "\n".join(
+            [
+                str(version),
+                self.get_serializer_class().__name__,
+                request.META.get("HTTP_ACCEPT", ""),
+                request.get_full_path(),
+            ]
+        )
+
+        return '"%s"' % hashlib.blake2b(variant.encode(), digest_size=16).hexdigest()
+
+    def get_not_modified_response(self, request):
+        self.etag = self.get_etag(request)
+
+        if self.etag is None:
+            return None
+
+        return get_conditional_response(request, etag=self.etag)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, "etag", None)
+
+        if etag is not None and response.status_code in (200, 304):
+            response["ETag"] = etag
+            patch_vary_headers(response, ["Accept", "Authorization"])
+
+        return response
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=a,b` keeps only those serializer fields in the responses of
+    `sparse_actions` and `?expand=` adds related ones (`?fields=id&expand=
+    genres`). Names the serializer does not render are answered with a 400
+    listing the valid ones. Views read `get_sparse_fields` to load only what
+    ends up rendered.
+    """
+
+    sparse_actions = ("list", "retrieve")
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_sparse_fields(self):
+        """
+        The selected field names in serializer order, or None when the
+        request does not select any (every field is rendered).
+        """
+        if not hasattr(self, "sparse_fields"):
+            self.sparse_fields = self.select_sparse_fields()
+
+        return self.sparse_fields
+
+    def select_sparse_fields(self):
+        params = self.request.query_params
+        fields = params.get(self.fields_query_param, "")
+        expand = params.get(self.expand_query_param, "")
+
+        if self.action not in self.sparse_actions or not (fields or expand):
+            return None
+
+        available = [
+            name
+            for name, field in self.get_serializer_class()().fields.items()
+            if not field.write_only
+        ]
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+        expanded = {name.strip() for name in expand.split(",") if name.strip()}
+        unknown = (selected | expanded) - set(available)
+
+        if unknown:
+            raise ParseError(
+                {
+                    "detail": f"Unknown fields: {', '.join(sorted(unknown))}.",
+                    "fields": available,
+                }
+            )
+
+        selected = (selected or set(available)) | expanded
+
+        return [name for name in available if name in selected]
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+
+        if fields is not None:
+            # a many=True serializer renders every item with its child
+            target = getattr(serializer, "child", serializer)
+
+            for name in set(target.fields) - set(fields):
+                target.fields.pop(name)
+
+        return serializer
+
+
+class ReplicaReadMixin:
+    """
+    Let the ORM reads of safe requests go to the read replicas (see
+    utils.routers). A user who writes through the view is pinned to the
+    primary for REPLICA_PIN_SECONDS, so they always read their own writes.
+    """
+
+    def reads_from_replica(self, request):
+        # a lagging replica would put old rows under the current version of
+        # the response cache and the ETags, so those actions read the primary
+        versioned = (
+            *getattr(self, "cached_actions", ()),
+            *getattr(self, "etag_actions", ()),
+        )
+
+        if request.method not in SAFE_METHODS or self.action in versioned:
+            return False
+
+        user_id = request.user.id
+
+        return not (user_id and is_pinned_to_primary(user_id))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if self.reads_from_replica(request):
+            self.replica_reads_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "replica_reads_token", None)
+
+        if token is not None:
+            replica_reads.reset(token)
+            self.replica_reads_token = None
+
+        if request.method not in SAFE_METHODS and request.user.id:
+            pin_to_primary(request.user.id)
+
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,187 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row of the previous page
+    instead of using OFFSET/COUNT. The body stays a plain list and the next
+    page is advertised in the `Link` header.
+    """
+
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+
+    orderings = {"id": ("id",)}
+    default_ordering = "id"
+
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.fields = self.orderings[self.ordering]
+
+        position = self.decode_cursor(request, queryset)
+
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        queryset = queryset.order_by(*self.fields)
+        results = list(queryset[: self.page_size + 1])
+
+        self.has_next = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        self.next_position = None
+        if self.has_next:
+            last = results[-1]
+
+            names = [field.lstrip("-") for field in self.fields]
+
+            # values() querysets page over dicts
+            if isinstance(last, dict):
+                self.next_position = [last[name] for name in names]
+            else:
+                self.next_position = [getattr(last, name) for name in names]
+
+        return results
+
+    def get_paginated_response(self, data):
+        headers = {}
+        next_link = self.get_next_link()
+
+        if next_link:
+            headers["Link"] = f'<{next_link}>; rel="next"'
+
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+
+        if ordering in self.orderings:
+            return ordering
+
+        return self.default_ordering
+
+    def get_seek_filter(self, position):
+        # (a, b) > (x, y)  ->  a > x OR (a = x AND b > y); "-a" seeks with <
+        seek = Q()
+        equal = {}
+
+        for field, value in zip(self.fields, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+
+            seek |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        return seek
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, position):
+        payload = json.dumps(
+            {"o": self.ordering, "p": position},
+            cls=DjangoJSONEncoder,
+            separators=(",", ":"),
+        )
+
+        return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(encoded + padding))
+            ordering = payload["o"]
+            position = payload["p"]
+        except (BinasciiError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if ordering != self.ordering or not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [
+                self.get_field(queryset, field).to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # the seek filter cannot compare with NULL; no ordering column is nullable
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+
+        return position
+
+    def get_field(self, queryset, field):
+        name = field.lstrip("-")
+
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset.query.annotations[name].output_field
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "integer"},
+            },
+            {
+                "name": self.ordering_query_param,
+                "required": False,
+                "in": "query",
+                "schema": {"type": "string", "enum": list(self.orderings)},
+            },
+        ]
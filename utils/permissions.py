@@ -17,3 +17,8 @@ class IsCriticoUser(BasePermission):
             return True
 
         return request.user.is_staff and not request.user.is_superuser
+
+
+class IsSuperUser(BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_superuser
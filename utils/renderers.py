@@ -0,0 +1,83 @@
+from json.encoder import c_make_encoder, encode_basestring
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_stdlib_encoder():
+    """
+    Build the compact, non-ASCII escaping, NaN rejecting encoder once. The
+    C encoder handles the JSON types itself and only calls DRF's `default`
+    for the rest (dates, decimals, lazy strings...).
+    """
+    encoder = JSONEncoder(
+        ensure_ascii=False, allow_nan=False, check_circular=False, separators=(",", ":")
+    )
+
+    if c_make_encoder is None:
+        return encoder.encode
+
+    iterencode = c_make_encoder(
+        None, encoder.default, encode_basestring, None, ":", ",", False, False, False
+    )
+
+    return lambda data: "".join(iterencode(data, 0))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Same output as JSONRenderer, rendered with orjson when it is installed
+    and with a prebuilt stdlib encoder otherwise. Indented output (the
+    browsable API, `Accept: application/json; indent=4`) is left to
+    JSONRenderer.
+    """
+
+    use_orjson = orjson is not None
+
+    # datetimes go through DRF's encoder, which trims them to milliseconds
+    orjson_options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+    )
+
+    encode = staticmethod(make_stdlib_encoder())
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.use_orjson:
+            try:
+                content = orjson.dumps(
+                    data, default=self.default, option=self.orjson_options
+                )
+            except orjson.JSONEncodeError:
+                # integers over 64 bits, circular data...
+                return self.render_stdlib(data)
+
+            # same escaping as JSONRenderer; both characters start with \xe2,
+            # so most documents skip the replaces
+            if b"\xe2" in content:
+                content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                    b"\xe2\x80\xa9", b"\\u2029"
+                )
+
+            return content
+
+        return self.render_stdlib(data)
+
+    def render_stdlib(self, data):
+        content = self.encode(data)
+
+        if "\u2028" in content or "\u2029" in content:
+            content = content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+        return content.encode()
@@ -0,0 +1,41 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# set by ReplicaReadMixin while a view may read from the replicas
+replica_reads = ContextVar("replica_reads", default=False)
+
+PIN_KEY = "replica:pin:{}"
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(PIN_KEY.format(user_id)) is not None
+
+
+class ReplicaRouter:
+    """
+    Send reads to a random alias of REPLICA_DATABASES while `replica_reads`
+    is on, everything else to the primary. Replicas get their schema from
+    the primary, so migrations only run there.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.REPLICA_DATABASES and replica_reads.get():
+            return random.choice(settings.REPLICA_DATABASES)
+
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -0,0 +1,35 @@
+from django.db.backends.sqlite3 import base
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend plus two OPTIONS: "pragmas", run on every new
+    connection, and "transaction_mode", the BEGIN used by atomic blocks.
+    IMMEDIATE takes the write lock up front, so a transaction that reads
+    before writing waits on busy_timeout instead of failing with "database
+    is locked" when another writer got in first.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop("pragmas", {})
+        self.transaction_mode = params.pop("transaction_mode", None)
+
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f"BEGIN {self.transaction_mode}")
+        else:
+            super()._start_transaction_under_autocommit()
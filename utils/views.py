@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+from utils.authentication import CachedTokenAuthentication
+from utils.metrics import registry
+from utils.permissions import IsSuperUser
+
+
+class MetricsView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsSuperUser]
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )